@@ -0,0 +1,176 @@
+import functools
+import math
+import threading
+import time
+
+from flask import make_response
+
+import metrics
+
+# Admission control for the recognition routes (/upload, /upload/burst,
+# /exit/detect). OCR takes hundreds of milliseconds, and with nothing in front
+# of it a burst of uploads occupied every gunicorn thread, so cheap routes
+# (/slotview, /admin/dashboard, /log_exit) queued behind them and exits waited
+# behind entries.
+#
+# At most `concurrency` recognitions run at once per worker process; up to
+# `max_queue` more wait, ordered by lane (exit before entry, so a blocked exit
+# does not back traffic up into the street) and then by arrival. Anything
+# beyond that is turned away at once with 429 and a Retry-After estimated from
+# the queue length and recent processing times, instead of holding a thread
+# until the client times out. An arriving exit that finds the queue full
+# takes the place of the newest waiting entry, which gets the 429 instead.
+# A request that waits longer than max_wait is also rejected.
+#
+# `concurrency` also bounds OCR batching: only admitted requests reach
+# ocr_batcher.BatchedReader, so a batch can never hold more than
+# `concurrency` images. With concurrency 1 every batch is a single image and
+# the batcher only adds its max_wait_ms; the app therefore defaults
+# RECOGNITION_CONCURRENCY to OCR_MAX_BATCH, so one full batch of requests can
+# be in OCR together. Setting it higher than OCR_MAX_BATCH runs several
+# batches back to back; setting it lower caps the batch size at concurrency.
+#
+# Waiting requests still hold a gunicorn thread, so concurrency + max_queue
+# (plus SSE_MAX_CLIENTS) should stay below GUNICORN_THREADS to keep threads
+# free for everything else.
+#
+# Queue wait and processing time are measured separately, both as metrics
+# and in a Server-Timing header on the response.
+
+LANES = {'exit': 0, 'entry': 1}  # lower runs first
+
+queue_wait_seconds = metrics.registry.register(metrics.Histogram(
+    'gate_queue_wait_seconds', 'Time recognition requests waited for a slot', ('lane',)))
+processing_seconds = metrics.registry.register(metrics.Histogram(
+    'gate_recognition_seconds', 'Time recognition requests spent running after admission', ('lane',)))
+rejected = metrics.registry.register(metrics.Counter(
+    'gate_rejected_total', 'Recognition requests turned away with 429', ('lane', 'reason')))
+queued = metrics.registry.register(metrics.Gauge(
+    'gate_queue_depth', 'Recognition requests waiting for a slot', ('lane',)))
+
+
+class QueueFull(Exception):
+    def __init__(self, lane, reason, retry_after):
+        super().__init__(f"{lane} recognition queue {reason}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    def __init__(self, lane, seq):
+        self.lane = lane
+        self.priority = LANES[lane]
+        self.seq = seq
+        self.state = 'waiting'  # -> 'admitted' or 'evicted'
+        self.event = threading.Event()
+        self.enqueued = time.perf_counter()
+        self.started = None
+
+    @property
+    def order(self):
+        return self.priority, self.seq
+
+
+class AdmissionControl:
+    def __init__(self, concurrency=1, max_queue=2, max_wait=30.0):
+        self.concurrency = max(1, int(concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = float(max_wait)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.waiting = []  # small, so a list scanned by Ticket.order is enough
+        self.seq = 0
+        self.service_time = 0.5  # moving average of processing seconds, for Retry-After
+
+    def retry_after(self):
+        backlog = len(self.waiting) + self.running
+        return max(1, math.ceil(backlog * self.service_time / self.concurrency))
+
+    def acquire(self, lane):
+        # Returns an admitted Ticket or raises QueueFull
+        with self.lock:
+            self.seq += 1
+            ticket = Ticket(lane, self.seq)
+            if self.running < self.concurrency and not self.waiting:
+                self._start(ticket)
+                return ticket
+            if len(self.waiting) >= self.max_queue:
+                worst = max(self.waiting, key=lambda t: t.order, default=None)
+                if worst is None or worst.priority <= ticket.priority:
+                    rejected.inc(lane=lane, reason='full')
+                    raise QueueFull(lane, 'full', self.retry_after())
+                # Bump the newest waiter of a lower-priority lane
+                self._remove(worst)
+                worst.state = 'evicted'
+                worst.event.set()
+            self.waiting.append(ticket)
+            queued.inc(lane=lane)
+
+        ticket.event.wait(self.max_wait)
+        with self.lock:
+            if ticket.state == 'admitted':
+                return ticket
+            if ticket.state == 'waiting':
+                self._remove(ticket)
+                reason = 'timeout'
+            else:
+                reason = 'evicted'
+            rejected.inc(lane=lane, reason=reason)
+            raise QueueFull(lane, reason, self.retry_after())
+
+    def release(self, ticket):
+        elapsed = time.perf_counter() - ticket.started
+        processing_seconds.observe(elapsed, lane=ticket.lane)
+        with self.lock:
+            self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+            self.running -= 1
+            while self.waiting and self.running < self.concurrency:
+                best = min(self.waiting, key=lambda t: t.order)
+                self._remove(best)
+                self._start(best)
+                best.event.set()
+
+    def _start(self, ticket):
+        ticket.state = 'admitted'
+        ticket.started = time.perf_counter()
+        self.running += 1
+        queue_wait_seconds.observe(ticket.started - ticket.enqueued, lane=ticket.lane)
+
+    def _remove(self, ticket):
+        self.waiting.remove(ticket)
+        queued.dec(lane=ticket.lane)
+
+    def stats(self):
+        with self.lock:
+            waiting = {lane: 0 for lane in LANES}
+            for ticket in self.waiting:
+                waiting[ticket.lane] += 1
+            return {'concurrency': self.concurrency, 'max_queue': self.max_queue,
+                    'running': self.running, 'waiting': waiting,
+                    'service_ms': round(self.service_time * 1000, 1)}
+
+    def guard(self, lane, on_reject):
+        # Decorator for a Flask view: runs it once admitted in `lane`, else
+        # returns on_reject(QueueFull). Adds a Server-Timing header with the
+        # queue wait and processing time.
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+
+        def decorate(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    ticket = self.acquire(lane)
+                except QueueFull as e:
+                    return on_reject(e)
+                try:
+                    response = make_response(view(*args, **kwargs))
+                finally:
+                    self.release(ticket)
+                wait_ms = (ticket.started - ticket.enqueued) * 1000
+                run_ms = (time.perf_counter() - ticket.started) * 1000
+                response.headers['Server-Timing'] = f'queue;dur={wait_ms:.1f}, process;dur={run_ms:.1f}'
+                return response
+            return wrapper
+        return decorate
@@ -0,0 +1,162 @@
+import heapq
+import threading
+
+from lot_layout import INF, RouteTable, load_layout
+from occupancy_store import OccupancyStore, normalize_plate
+from plate_index import PlateIndex
+from slot_events import ALLOCATED, FREED
+
+# In-process port of parking.cpp. The lot graph (lot_layout.py) and every
+# slot's cost are computed once when the allocator is built; after that an
+# allocation is a heap pop and a path lookup instead of a fork/exec of
+# ./parking. Each entry gate has its own heap of free slots ordered by
+# distance from that gate.
+# Occupancy itself lives in occupancy_store; slots.txt is only read once, to
+# import allocations made before the store existed.
+
+SLOTS_FILE = 'slots.txt'
+
+
+class SlotAllocator:
+    def __init__(self, store=None, slots_file=SLOTS_FILE, events=None, layout=None):
+        # The store is the source of truth for occupancy; the heaps and the
+        # plate index are this process's view of it, rebuilt whenever another
+        # worker commits. events (a slot_events.SlotEvents) is told about
+        # every slot this process allocates or frees. layout defaults to
+        # LOT_LAYOUT or the parking.cpp lot (see lot_layout.py).
+        self.store = store or OccupancyStore()
+        self.events = events
+        self.routes = RouteTable(layout or load_layout())
+        self.lock = threading.Lock()
+        self.store.import_slots_txt(slots_file)
+        self.free_slots = set()
+        self.free_heaps = {}
+        self.index = PlateIndex()
+        self.synced_version = None
+        self.resync()
+
+    def resync(self, conn=None):
+        occupied = self.store.occupied(conn)
+        self.free_slots = {slot for slot in self.routes.slots if slot not in occupied}
+        self.free_heaps = {}
+        for gate in self.routes.entries:
+            heap = [(cost, slot) for cost, slot in self.routes.ranked(gate) if slot in self.free_slots]
+            heapq.heapify(heap)
+            self.free_heaps[gate] = heap
+        self.index = PlateIndex(normalize_plate(p) for p in occupied.values())
+        self.synced_version = self.store.data_version()
+
+    def _check_sync(self, conn=None):
+        if self.store.data_version() != self.synced_version:
+            self.resync(conn)
+
+    def allocate(self, plate, gate=None):
+        # Returns the same dict the C++ binary prints, or None when full.
+        # gate picks the entry slots are ranked from (default: the first).
+        gate = self.routes.gate(gate)
+        with self.lock:
+            popped = []  # heap entries to put back if the transaction fails
+            try:
+                with self.store.transaction() as conn:
+                    slot = self.store.slot_for_plate(plate, conn)
+                    allocated = slot is None
+                    if allocated:
+                        self._check_sync(conn)
+                        heap = self.free_heaps[gate]
+                        while heap:
+                            # Slots taken through another gate's heap are
+                            # skipped here rather than removed from every heap
+                            entry = heapq.heappop(heap)
+                            popped.append(entry)
+                            if entry[1] in self.free_slots and self.store.insert(conn, plate, entry[1]):
+                                slot = entry[1]
+                                break
+                        if slot is None:
+                            return None
+            except BaseException:
+                # Rolled back: the database still has these slots free
+                for entry in popped:
+                    heapq.heappush(heap, entry)
+                raise
+            # Only once committed does this process stop offering the slot
+            if allocated:
+                self.free_slots.discard(slot)
+            self.index.add(normalize_plate(plate))
+        if allocated and self.events is not None:
+            self.events.publish(ALLOCATED, slot, plate)
+        return {'plate': plate, 'slot': slot, 'path': self.path_for(slot, gate)}
+
+    def _freed(self, slot, plate):
+        self.index.remove(normalize_plate(plate))
+        if slot in self.routes and slot not in self.free_slots:
+            self.free_slots.add(slot)
+            for gate, heap in self.free_heaps.items():
+                cost = self.routes.cost(slot, gate)
+                if cost != INF:
+                    heapq.heappush(heap, (cost, slot))
+                if len(heap) > 2 * len(self.routes):
+                    # A gate that rarely allocates collects stale entries
+                    self.free_heaps[gate] = [(c, s) for c, s in set(heap) if s in self.free_slots]
+                    heapq.heapify(self.free_heaps[gate])
+        if self.events is not None:
+            self.events.publish(FREED, slot, plate)
+
+    def free(self, slot):
+        # Returns the plate that was parked in the slot, or None
+        with self.lock:
+            plate = self.store.free_slot(slot)
+            if plate is not None:
+                self._freed(slot, plate)
+        return plate
+
+    def release(self, plate, max_distance=None):
+        # Frees whatever slot the plate is parked in and returns it, or None.
+        # With max_distance, falls back to the closest parked plate.
+        match = self.release_match(plate, max_distance)
+        return match[0] if match else None
+
+    def release_match(self, plate, max_distance=None):
+        # Frees the parked car matching an OCR'd exit plate: an exact match
+        # first, then (if max_distance is given) the nearest parked plate
+        # within that many OCR-weighted edits, provided no other parked
+        # plate is also that close. Returns (slot, parked_plate, edits) or
+        # None.
+        with self.lock:
+            freed = self.store.free_plate(plate)
+            edits = 0.0
+            if freed is None and max_distance:
+                self._check_sync()
+                match = self.index.best(normalize_plate(plate), max_distance)
+                if match is not None:
+                    freed = self.store.free_plate(match[0])
+                    edits = match[1]
+            if freed is None:
+                return None
+            slot, parked_plate = freed
+            self._freed(slot, parked_plate)
+        return slot, parked_plate, edits
+
+    def release_latest(self):
+        # Frees the most recently parked car; returns (plate, slot) or None
+        with self.lock:
+            freed = self.store.free_latest()
+            if freed is not None:
+                self._freed(freed[1], freed[0])
+        return freed
+
+    def occupancy(self):
+        # Compact full state for event stream clients
+        return {'total': len(self.routes), 'occupied': self.store.occupied()}
+
+    def snapshot(self):
+        # Live occupancy straight from the store, in layout order
+        parked = {slot: (plate, at) for slot, plate, at in self.store.allocations()}
+        slots = []
+        for slot in self.routes.slots:
+            plate, at = parked.get(slot, (None, None))
+            slots.append({'slot': slot, 'occupied': plate is not None, 'plate': plate, 'since': at})
+        occupied = sum(1 for s in slots if s['occupied'])
+        return {'total': len(slots), 'occupied': occupied, 'free': len(slots) - occupied, 'slots': slots}
+
+    def path_for(self, slot, gate=None):
+        return self.routes.path(slot, gate)
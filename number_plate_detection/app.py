@@ -1,31 +1,105 @@
-
-
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session
+from flask import Flask, request, jsonify, render_template, redirect, url_for, session, g, Response, stream_with_context
 from flask_cors import CORS
 import cv2
-import numpy as np
-import easyocr
-import base64
-import subprocess
-import json
 import ast
-import csv
+import json
 import os
+import time
 from datetime import datetime
-from save_data import save_vehicle_log
+import event_log
+from image_store import images
+from record_index import RecordIndex, valid_time
+from slot_events import SlotEvents, format_event
+from allocator import SlotAllocator
+from ocr_batcher import BatchedReader
+from image_input import UploadRequest, decode_request_image, iter_request_frames
+from plate_consensus import PlateConsensus, normalize
+import models
+import metrics
+from admission import AdmissionControl
+from ocr_cache import OcrCache, dhash
+from werkzeug.exceptions import RequestEntityTooLarge
 
 app = Flask(__name__, static_url_path='/static', static_folder='static', template_folder='template')
+app.request_class = UploadRequest  # multipart image parts stay in memory, see image_input
 
-print("Template folder path:", os.path.abspath('template'))
-print("Files inside template:", os.listdir('template'))
 app.secret_key = 'your_secret_key_here'  # Change this for production
-
-plate_cascade = cv2.CascadeClassifier('haarcascade_russian_plate_number.xml')
-reader = easyocr.Reader(['en'])
+# Largest request body accepted (uploads, bursts, clips); bigger ones get 413
+# before anything is buffered
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.environ.get('MAX_UPLOAD_MB', 32)) * 1024 * 1024)
+
+# MODEL_LOADING=preload loads the models now (once per gunicorn master when
+# preload_app is on), MODEL_LOADING=lazy defers it to the first request
+if models.MODEL_LOADING == 'preload':
+    models.preload()
+# Concurrent requests share the reader through a micro-batching queue
+OCR_MAX_BATCH = int(os.environ.get('OCR_MAX_BATCH', 8))
+ocr = BatchedReader(models.get_reader,
+                    max_batch_size=OCR_MAX_BATCH,
+                    max_wait_ms=float(os.environ.get('OCR_MAX_WAIT_MS', 5)))
+# Retakes of the same car reuse the earlier OCR result (see ocr_cache.py).
+# Entry plate crops only; exits always run OCR. Exact hash matches unless
+# OCR_CACHE_MAX_DISTANCE opts in to near matches.
+ocr_cache = OcrCache('app',
+                     max_entries=int(os.environ.get('OCR_CACHE_SIZE', 1024)),
+                     ttl_seconds=float(os.environ.get('OCR_CACHE_TTL', 300)),
+                     max_distance=int(os.environ.get('OCR_CACHE_MAX_DISTANCE', 0)))
+# Allocations and exits are pushed to /api/slots/events subscribers
+slot_events = SlotEvents(capacity=int(os.environ.get('SSE_BUFFER_EVENTS', 1024)))
+allocator = SlotAllocator(events=slot_events)
+# Each open stream holds a worker thread, so keep this below GUNICORN_THREADS
+SSE_MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', 2))
+SSE_KEEPALIVE_SECONDS = 15.0
+# Entry/exit history for /api/records, tailed from the log files per query
+records = RecordIndex()
+# OCR-weighted edits allowed when an exit plate has no exact match; 0 disables.
+# 0.5 admits one look-alike substitution (0/O, 8/B, ... costs 0.4, see
+# plate_index.py) but never an arbitrary character, which could be another car
+EXIT_MATCH_MAX_DISTANCE = float(os.environ.get('EXIT_MATCH_MAX_DISTANCE', 0.5))
+# /upload/burst stops reading frames once the plate consensus reaches this
+# confidence (see plate_consensus.py); clips are sampled every stride frames
+BURST_CONFIDENCE = float(os.environ.get('BURST_CONFIDENCE', 0.85))
+BURST_MAX_FRAMES = int(os.environ.get('BURST_MAX_FRAMES', 30))
+BURST_VIDEO_STRIDE = int(os.environ.get('BURST_VIDEO_STRIDE', 3))
+# Recognition routes share a bounded, exit-first work queue (admission.py).
+# Only admitted requests reach the OCR batcher, so admit a full batch
+admission = AdmissionControl(concurrency=int(os.environ.get('RECOGNITION_CONCURRENCY', OCR_MAX_BATCH)),
+                             max_queue=int(os.environ.get('RECOGNITION_QUEUE', 2)),
+                             max_wait=float(os.environ.get('RECOGNITION_MAX_WAIT', 30)))
+burst_frames = metrics.registry.register(metrics.Histogram(
+    'gate_burst_frames', 'Frames read per /upload/burst request, by outcome', ('outcome',),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 30)))
 
 # Enable CORS for all routes (can be restricted if needed)
 CORS(app)
 
+# -------- METRICS --------
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.metrics_endpoint = request.endpoint or 'unknown'
+    metrics.in_flight.inc(endpoint=g.metrics_endpoint)
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = g.get('metrics_endpoint', 'unknown')
+    metrics.requests_total.inc(endpoint=endpoint, method=request.method)
+    if response.status_code >= 400:
+        metrics.errors_total.inc(endpoint=endpoint, status=response.status_code)
+    if 'metrics_start' in g:
+        metrics.request_seconds.observe(time.perf_counter() - g.metrics_start, endpoint=endpoint)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'metrics_endpoint' in g:
+        metrics.in_flight.dec(endpoint=g.metrics_endpoint)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format, for this worker process
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.after_request
 def add_no_cache_headers(response):
     response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0"
@@ -33,6 +107,17 @@ def add_no_cache_headers(response):
     response.headers["Expires"] = "0"
     return response
 
+# -------- READINESS --------
+@app.route('/ready')
+def ready():
+    # 200 once the plate detector and EasyOCR are loaded in this worker, 503 before.
+    # ?warm=1 loads them now, e.g. from a deploy hook in lazy mode.
+    if request.args.get('warm') == '1':
+        models.preload()
+    status = models.status()
+    status['admission'] = admission.stats()
+    return jsonify(status), (200 if status['ready'] else 503)
+
 # -------- DEFAULT REDIRECT TO ADMIN LOGIN --------
 @app.route('/')
 def index():
@@ -83,7 +168,70 @@ def slotview():
 #----------car records-------
 @app.route('/carrecords')
 def carrecords():
-    return render_template('carrecords.html')
+    entries, _ = records.query(event='entry', limit=50)
+    vehicles = [{'plate': r['plate'], 'entry_time': r['time'], 'slot': r['slot'] or 'N/A'} for r in entries]
+    return render_template('carrecords.html', vehicles=vehicles)
+
+# -------- QUERY API --------
+@app.route('/api/records')
+def api_records():
+    # ?from=&to= (timestamps or date prefixes, inclusive), ?plate= (prefix),
+    # ?event=entry|exit, ?limit= (max 500) and ?cursor= from the last page
+    start = request.args.get('from') or None
+    end = request.args.get('to') or None
+    event = request.args.get('event') or None
+    if not valid_time(start) or not valid_time(end):
+        return jsonify({'error': 'from/to must look like YYYY-MM-DD[ HH:MM:SS]'}), 400
+    if event not in (None, 'entry', 'exit'):
+        return jsonify({'error': 'event must be entry or exit'}), 400
+    try:
+        limit = int(request.args.get('limit', 50))
+        page, cursor = records.query(start=start, end=end, plate=request.args.get('plate') or None,
+                                     event=event, cursor=request.args.get('cursor') or None, limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'records': page, 'next_cursor': cursor})
+
+@app.route('/api/slots')
+def api_slots():
+    return jsonify(allocator.snapshot())
+
+@app.route('/api/slots/events')
+def api_slot_events():
+    # Server-Sent Events: a "snapshot" on connect (and again after falling
+    # behind or after another worker changed occupancy), then
+    # slot-allocated / slot-freed as they happen
+    if not slot_events.subscribe(SSE_MAX_CLIENTS):
+        return jsonify({'error': 'Too many live clients, poll /api/slots instead'}), 503, {'Retry-After': '30'}
+
+    def snapshot():
+        seq = slot_events.seq
+        data = json.dumps(allocator.occupancy(), separators=(',', ':'))
+        return seq, allocator.store.data_version(), format_event('snapshot', data, seq)
+
+    def stream():
+        seq, version, message = snapshot()
+        yield message
+        last_sent = time.monotonic()
+        while True:
+            events = slot_events.wait(seq, timeout=1.0)
+            if events is None or (not events and allocator.store.data_version() != version):
+                seq, version, message = snapshot()
+                yield message
+            elif events:
+                yield ''.join(format_event(kind, data, s) for s, kind, data in events)
+                seq = events[-1][0]
+            elif time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                # Also how a closed connection is noticed
+                yield ': keepalive\n\n'
+            else:
+                continue
+            last_sent = time.monotonic()
+
+    response = Response(stream_with_context(stream()), content_type='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(slot_events.unsubscribe)
+    return response
 
 # -------- ADMIN LOGOUT --------
 @app.route('/adminlogout')
@@ -107,108 +255,159 @@ def user_dashboard():
 
 # Helper function to save cropped plate image
 def save_plate_image(image, plate_text):
-    folder_path = 'plates/plate_img'
-    os.makedirs(folder_path, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{plate_text}_{timestamp}.jpg"
-    filepath = os.path.join(folder_path, filename)
-    cv2.imwrite(filepath, image)
-    return filepath
+    # Queued for the background writer (see image_store.py); returns a
+    # Future for the stored path, or None if the writer is backed up
+    return images.save(image, plate_text, source='upload')
 
 # Helper function to log data into CSV
 def log_vehicle(plate_text, slot):
-    log_file = 'vehicle_logs.csv'
-    file_exists = os.path.isfile(log_file)
-    with open(log_file, 'a', newline='') as csvfile:
-        fieldnames = ['Plate', 'slot', 'Timestamp']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow({
-            'Plate': plate_text.strip().replace(" ", ""),
-            'slot': slot if slot else 'N/A',
-            'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
+    # Queued for the background event log writer (see event_log.py)
+    event_log.record('entry', plate_text, slot=slot if slot else 'N/A', gate='Entry', source='upload')
+
+# -------- OCR IMAGE UPLOAD --------
+@app.errorhandler(RequestEntityTooLarge)
+def too_large(e):
+    return jsonify({'error': 'Upload too large', 'max_bytes': app.config['MAX_CONTENT_LENGTH']}), 413
+
+
+def busy(e):
+    return jsonify({'error': 'Gate is busy, try again shortly', 'lane': e.lane, 'reason': e.reason,
+                    'retry_after': e.retry_after}), 429, {'Retry-After': str(e.retry_after)}
+
 
-# -------- OCR IMAGE UPLOAD --------@app.route('/upload', methods=['POST'])
 @app.route('/upload', methods=['POST'])
+@admission.guard('entry', busy)
 def upload_image():
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Content-Type must be application/json'}), 400
+        # Accepts a JSON data URL, a raw image/jpeg body or a multipart upload
+        with metrics.stage('decode'):
+            img, error = decode_request_image(request)
+        if img is None:
+            return jsonify({'error': error}), 400
 
-        img_data = request.json.get('image', '')
-        if not img_data or ',' not in img_data:
-            return jsonify({'error': 'Invalid image data'}), 400
+        reading = read_frame(img)
+        print("OCR Plate Text:", reading[0] if reading else None)
+        if reading is None:
+            return jsonify({"error": "Plate number not detected. Please retake the photo."}), 400
 
-        img_str = img_data.split(',')[1]
-        img_bytes = base64.b64decode(img_str)
-        img_array = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        if img is None:
-            return jsonify({'error': 'Failed to decode image'}), 400
+        plate_text, _, cropped_plate_img = reading
+        return admit_plate(plate_text, cropped_plate_img)
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        plates = plate_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
-        print("Plates detected:", plates)
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        print("Error during upload:", str(e))
+        return jsonify({"error": "Failed to process image"}), 500
 
-        plate_text = "Not Detected"
-        cropped_plate_img = None
 
-        for (x, y, w, h) in plates:
-            cropped_plate_img = img[y:y+h, x:x+w]
-            plate_gray = cv2.cvtColor(cropped_plate_img, cv2.COLOR_BGR2GRAY)
-            plate_resized = cv2.resize(plate_gray, (1024, 256))
-            plate_text = read_plate_text(plate_resized)
-            print("OCR Plate Text:", plate_text)
-            break
+@app.route('/upload/burst', methods=['POST'])
+@admission.guard('entry', busy)
+def upload_burst():
+    # Several frames of the same car (a burst of stills or a short clip, see
+    # image_input.py). Frames are decoded and read one at a time, voting per
+    # character, until the consensus is confident or the frames run out.
+    # With ?more=1 the client can still send more frames (camera.html posts
+    # one still first), so a missing or unconfident read is answered with
+    # 202 and need_more instead of being admitted.
+    more = request.args.get('more') == '1'
+    try:
+        consensus = PlateConsensus()
+        best_crops = {}  # normalised reading -> (OCR confidence, crop)
+        frames = 0
+        plate_text, confidence = "", 0.0
+        frame_iter = iter_request_frames(request, BURST_VIDEO_STRIDE, BURST_MAX_FRAMES)
+        try:
+            while confidence < BURST_CONFIDENCE:
+                with metrics.stage('decode'):
+                    img = next(frame_iter, None)
+                if img is None:
+                    break
+                frames += 1
+                reading = read_frame(img)
+                if reading is None:
+                    continue
+                text, prob, crop = reading
+                consensus.add(text, prob)
+                if text not in best_crops or prob > best_crops[text][0]:
+                    best_crops[text] = (prob, crop.copy())  # don't keep whole frames alive
+                plate_text, confidence = consensus.result()
+        finally:
+            frame_iter.close()
+
+        if not frames:
+            return jsonify({'error': 'No frames could be decoded'}), 400
+        confident = confidence >= BURST_CONFIDENCE
+        outcome = 'consensus' if confident else 'more' if more else 'exhausted' if plate_text else 'failed'
+        burst_frames.observe(frames, outcome=outcome)
+        print(f"Burst: {frames} frames, {consensus.readings} readings -> {plate_text or None} ({confidence:.2f})")
+        if more and not confident:
+            return jsonify({'need_more': True, 'plate_number': plate_text or None,
+                            'confidence': round(confidence, 3), 'frames': frames}), 202
+        if not plate_text:
+            return jsonify({"error": "Plate number not detected. Please retake the photo.", 'frames': frames}), 400
+
+        # Store the best crop that reads as the consensus, else the best crop
+        _, crop = best_crops.get(plate_text) or max(best_crops.values(), key=lambda item: item[0])
+        return admit_plate(plate_text, crop, frames=frames, readings=consensus.readings,
+                           confidence=round(confidence, 3))
+
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        print("Error during burst upload:", str(e))
+        return jsonify({"error": "Failed to process frames"}), 500
+
+
+def read_frame(img):
+    # (normalised plate text, OCR confidence, plate crop) for the largest
+    # plate in a frame, or None if no plate was found or read
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    with metrics.stage('detect'):
+        plates = models.get_detector().detect(gray)
+    for (x, y, w, h) in plates[:1]:
+        cropped_plate_img = img[y:y+h, x:x+w]
+        plate_gray = cv2.cvtColor(cropped_plate_img, cv2.COLOR_BGR2GRAY)
+        plate_resized = cv2.resize(plate_gray, (1024, 256))
+        for (_, text, prob) in cached_readtext(plate_resized):
+            # Same format from /upload and /upload/burst (whose per-character
+            # vote needs it): upper case letters and digits only
+            text = normalize(text)
+            if len(text) > 3:
+                return text, float(prob), cropped_plate_img
+    return None
+
+
+def admit_plate(plate_text, cropped_plate_img, **extra):
+    # Shared tail of /upload and /upload/burst: store the crop, allocate a
+    # slot and log the entry; extra fields are added to the response
+    save_plate_image(cropped_plate_img, plate_text)
 
-        if plate_text == "Not Detected" or cropped_plate_img is None:
-            return jsonify({"error": "Plate number not detected. Please retake the photo."}), 400
+    try:
+        with metrics.stage('allocate'):
+            output = allocator.allocate(plate_text)
+        if output is None:
+            return jsonify({'plate_number': plate_text, 'error': 'Parking allocation failed', **extra}), 500
 
-        plate_text = plate_text.strip().replace(" ", "")
-        save_plate_image(cropped_plate_img, plate_text)
+        slot = output.get('slot', 'N/A')
+        path = output.get('path', [])
+        entry_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        try:
-            result = subprocess.run(['./parking', plate_text], capture_output=True, text=True, timeout=10)
-            if result.returncode != 0:
-                return jsonify({'plate_number': plate_text, 'error': 'Parking allocation failed'}), 500
-
-            output_json = result.stdout.strip()
-            try:
-                output = json.loads(output_json)
-            except Exception:
-                output = {}
-                lines = result.stdout.strip().split('\n')
-                for line in lines:
-                    if "slot" in line.lower():
-                        output['slot'] = line.split(':')[-1].strip()
-                    if "path" in line.lower():
-                        output['path'] = line.split(':')[-1].strip().split()
-
-            slot = output.get('slot', 'N/A')
-            path = output.get('path', [])
-            entry_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-            log_vehicle(plate_text, slot)
-
-            # ✅ Return JSON instead of redirect
-            return jsonify({
-                'plate_number': plate_text,
-                'slot': slot,
-                'time': entry_time,
-                'path': path
-            })
+        log_vehicle(plate_text, slot)
 
-        except Exception as e:
-            return jsonify({
-                "plate_number": plate_text,
-                "error": f"Allocation backend failed: {str(e)}"
-            }), 500
+        # ✅ Return JSON instead of redirect
+        return jsonify({
+            'plate_number': plate_text,
+            'slot': slot,
+            'time': entry_time,
+            'path': path,
+            **extra
+        })
 
     except Exception as e:
-        print("Error during upload:", str(e))
-        return jsonify({"error": "Failed to process image"}), 500
+        return jsonify({
+            "plate_number": plate_text,
+            "error": f"Allocation backend failed: {str(e)}"
+        }), 500
 
 #----graph-----
 @app.route('/show_path_graph', methods=['POST'])
@@ -223,17 +422,22 @@ def show_path_graph():
 
 
 # -------- OCR FUNCTION --------
-def read_plate_text(image):
-    results = sorted(reader.readtext(image), key=lambda x: x[2], reverse=True)
-    for (bbox, text, prob) in results:
-        if len(text) > 3:
-            return text.strip()
-    return "Not Detected"
+def cached_readtext(image):
+    # EasyOCR results for a detector plate crop (never a whole frame), from
+    # the perceptual-hash cache when the same crop was read recently. Only
+    # non-empty results are cached so a failed read is retried on the next
+    # photo. Not for the exit path: a stale read there frees the wrong slot.
+    key = dhash(image)
+    results = ocr_cache.get(key)
+    if results is None:
+        with metrics.stage('ocr'):
+            results = sorted(ocr.readtext(image), key=lambda x: x[2], reverse=True)
+        if results:
+            ocr_cache.put(key, results)
+    return results
 
 # -------- SLOT ALLOCATION VIA API --------
-import subprocess
-import json  # ✅ Required to parse JSON from C++ output
-
+# Response and path format are described in README.md
 @app.route('/allocate', methods=['POST'])
 def allocate_slot():
     if not request.is_json:
@@ -245,32 +449,23 @@ def allocate_slot():
     if not plate_number:
         return jsonify({'error': 'No plate number provided'}), 400
 
-    try:
-        result = subprocess.run(['./parking', plate_number], capture_output=True, text=True, timeout=10)
-        print("Subprocess output:\n", result.stdout)
+    gate = data.get('gate')
+    if gate is not None and gate not in allocator.routes.entries:
+        return jsonify({'error': f'Unknown entry gate: {gate}'}), 400
 
-        if result.returncode != 0:
+    try:
+        with metrics.stage('allocate'):
+            result = allocator.allocate(plate_number, gate)
+        if result is None:
             return jsonify({
                 "plate_number": plate_number,
-                "error": "No available slot or error occurred",
-                "raw_output": result.stdout
+                "error": "No available slot or error occurred"
             }), 400
 
-        # ✅ Parse JSON output from C++ safely
-        try:
-            cxx_output = json.loads(result.stdout)
-        except json.JSONDecodeError:
-            return jsonify({'error': 'C++ output not in JSON format', 'raw_output': result.stdout}), 500
-
-        slot = cxx_output.get("slot")
-        path = cxx_output.get("path")
-        if not slot:
-            return jsonify({'error': 'Slot not found in C++ output', 'raw_output': result.stdout}), 500
-        print(slot)
         return jsonify({
-            "plate_number": cxx_output.get("plate"),
-            "slot": slot,
-            "path": path
+            "plate_number": result["plate"],
+            "slot": result["slot"],
+            "path": result["path"]
         })
 
     except Exception as e:
@@ -289,25 +484,10 @@ def capture_exit():
     slot = "UNKNOWN"
 
     try:
-        if os.path.exists('slots.txt'):
-            with open('slots.txt', 'r') as f:
-                lines = f.readlines()
-
-            if lines:
-                last_line = lines[-1].strip()
-                if ':' in last_line:
-                    slot, number = last_line.split(':', 1)
-                    slot = slot.strip()
-                    number = number.strip()
-
-                # Remove the last line from slots.txt (i.e., the exited vehicle)
-                with open('slots.txt', 'w') as f:
-                    for line in lines:
-                        if line.strip() != last_line:
-                            f.write(line)
-
-                # Log the exit
-                log_exit_locally(number)
+        # Frees the most recently parked vehicle
+        freed = allocator.release_latest()
+        if freed:
+            number, slot = freed
 
     except Exception as e:
         print(f"Error in capture_exit: {e}")
@@ -323,40 +503,26 @@ def log_exit():
     if not plate:
         return jsonify({"error": "Plate number not provided"}), 400
 
-    # Log exit into a separate file or update existing CSV
-    exit_file = 'exit_logs.csv'
-    file_exists = os.path.isfile(exit_file)
-    with open(exit_file, 'a', newline='') as csvfile:
-        fieldnames = ['Plate', 'Exit_Timestamp']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow({
-            'Plate': plate.strip().replace(" ", ""),
-            'Exit_Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
+    # Exit goes to the same event log as entries
+    event_log.record('exit', plate, gate='Exit', source='log_exit')
 
     return jsonify({"message": "Exit logged successfully"}), 200
 
 
 #-----Exit_Detect----
 @app.route('/exit/detect', methods=['POST'])
+@admission.guard('exit', busy)
 def detect_exit_plate():
     try:
-        data = request.get_json()
-        if not data or 'image' not in data:
-            return jsonify({'error': 'No image data provided'}), 400
-
-        img_data = data['image'].split(',')[1]
-        img_bytes = base64.b64decode(img_data)
-        img_array = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-
+        with metrics.stage('decode'):
+            img, error = decode_request_image(request)
         if img is None:
-            return jsonify({'error': 'Failed to decode image'}), 400
+            return jsonify({'error': error}), 400
 
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        results = sorted(reader.readtext(gray), key=lambda x: x[2], reverse=True)
+        # Always a fresh read: the result decides which car's slot is freed
+        with metrics.stage('ocr'):
+            results = sorted(ocr.readtext(gray), key=lambda x: x[2], reverse=True)
 
         plate = "UNKNOWN"
         for (_, text, prob) in results:
@@ -368,16 +534,19 @@ def detect_exit_plate():
             return jsonify({'error': 'Could not detect plate'}), 400
 
         # Save exit log
-        freed_slot = log_exit_locally(plate)
+        match = match_exit_locally(plate)
         # return render_template("exit_success.html", number=plate, slot=freed_slot)
 
-        if not freed_slot:
+        if not match:
             return jsonify({'error': ' Vehicle not found in the parking lot'}), 404
 
-
+        freed_slot, parked_plate, edits = match
+        event_log.record('exit', parked_plate, slot=freed_slot, gate='Exit', source='exit_detect')
 
         return jsonify({
             'plate': plate,
+            'matched_plate': parked_plate,
+            'match_distance': edits,
             'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'bill': 50,  # You can calculate the actual bill here
             'slot': freed_slot
@@ -386,35 +555,24 @@ def detect_exit_plate():
         # return render_template("exit_success.html", number=plate, slot=detected_slot)
 
 
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         return jsonify({'error': f'Error during detection: {str(e)}'}), 500
 
 
 # 👇 Also add this helper function (outside any route, anywhere above main)
-def log_exit_locally(plate):
-    updated_lines = []
-    freed_slot = None
-
-    plate = plate.upper().replace(" ", "").replace("]", "")
-
-    with open('slots.txt', 'r') as file:
-        lines = file.readlines()
+def match_exit_locally(plate):
+    # Exact match first (normalised: upper case, no spaces or "]"), then the
+    # closest parked plate within EXIT_MATCH_MAX_DISTANCE OCR-weighted edits,
+    # unless two parked plates are that close. Returns
+    # (slot, parked_plate, edits) or None.
+    with metrics.stage('free'):
+        return allocator.release_match(plate, EXIT_MATCH_MAX_DISTANCE)
 
-    for line in lines:
-        parts = line.strip().split()
-        if len(parts) == 2:
-            saved_plate = parts[0].replace("]", "")
-            slot = parts[1]
-            if saved_plate == plate:
-                freed_slot = slot
-                continue  # Don't keep this line (vehicle exited)
-        updated_lines.append(line)
-
-    if freed_slot:
-        with open('slots.txt', 'w') as file:
-            file.writelines(updated_lines)
-
-    return freed_slot  # Will be None if plate not found
+def log_exit_locally(plate):
+    match = match_exit_locally(plate)
+    return match[0] if match else None  # Will be None if plate not found
 
 
 # -------- MAIN --------
@@ -0,0 +1,75 @@
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from allocator import SlotAllocator
+from occupancy_store import OccupancyStore
+
+# Compares the old per-car `./parking <plate>` subprocess with the in-process
+# SlotAllocator. Both run inside a scratch directory so the real slots.txt is
+# never touched. Build the binary first with: g++ -O2 -o parking parking.cpp
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) > 1 else samples[0]
+    print(f"{name:12s} n={len(samples):4d}  mean={statistics.mean(samples) * 1000:8.3f} ms  "
+          f"p50={statistics.median(samples) * 1000:8.3f} ms  p95={p95 * 1000:8.3f} ms")
+
+
+def bench_subprocess(binary, plates, workdir):
+    samples = []
+    for plate in plates:
+        start = time.perf_counter()
+        subprocess.run([binary, plate], capture_output=True, text=True, timeout=10, cwd=workdir)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_in_process(plates, workdir):
+    start = time.perf_counter()
+    store = OccupancyStore(os.path.join(workdir, 'occupancy.db'))
+    allocator = SlotAllocator(store, slots_file=os.path.join(workdir, 'slots.txt'))
+    startup = time.perf_counter() - start
+
+    samples = []
+    for i, plate in enumerate(plates):
+        start = time.perf_counter()
+        result = allocator.allocate(plate)
+        samples.append(time.perf_counter() - start)
+        # Free every other car so the lot never fills and the heap stays busy
+        if result and i % 2:
+            allocator.free(result['slot'])
+    return startup, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark slot allocation backends")
+    parser.add_argument('--binary', default='./parking', help="compiled parking.cpp")
+    parser.add_argument('--cars', type=int, default=40)
+    args = parser.parse_args()
+
+    plates = [f"BENCH{i:04d}" for i in range(args.cars)]
+
+    workdir = tempfile.mkdtemp(prefix='alloc_bench_')
+    try:
+        startup, samples = bench_in_process(plates, workdir)
+        print(f"in-process startup (graph + route precompute): {startup * 1000:.3f} ms")
+        summarize('in-process', samples)
+
+        binary = os.path.abspath(args.binary)
+        if os.path.exists(binary):
+            # The binary only ever holds 50 cars, keep the run within that
+            summarize('subprocess', bench_subprocess(binary, plates[:50], workdir))
+        else:
+            print(f"subprocess: skipped, {args.binary} not found")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from bench_ocr import load_corpus
+from plate_detector import PRESETS, CascadeDetector, DnnDetector, RoiMask, ScaledSearch
+
+# Latency and recall of the plate detector backends on synthetic gate
+# frames. Each corpus crop (plates/plate_img) is pasted at a random size and
+# position onto a background frame (a frame of the parking video, scaled to
+# --width x --height, or noise), so the true plate box is known:
+#   recall@1   - the detector's best box overlaps the plate (IoU >= --iou)
+#   recall@any - any returned box does
+#
+#   python bench_detector.py --dnn-model plate.onnx --json detectors.json
+
+
+def backgrounds(video, width, height, count, rng):
+    frames = []
+    cap = cv2.VideoCapture(video) if video else None
+    if cap is not None and cap.isOpened():
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 1
+        for i in range(count):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, (i * total) // count)
+            ok, frame = cap.read()
+            if ok:
+                frames.append(cv2.resize(frame, (width, height)))
+        cap.release()
+    while len(frames) < count:
+        frames.append(rng.integers(0, 255, (height, width, 3), dtype=np.uint8))
+    return frames
+
+
+def make_scenes(corpus, bgs, rng):
+    scenes = []
+    for i, (name, _, data) in enumerate(corpus):
+        crop = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if crop is None:
+            continue
+        frame = bgs[i % len(bgs)].copy()
+        fh, fw = frame.shape[:2]
+        w = int(rng.integers(fw // 8, fw // 4))
+        h = max(1, int(crop.shape[0] * w / crop.shape[1]))
+        x, y = int(rng.integers(0, fw - w)), int(rng.integers(fh // 3, fh - h))
+        frame[y:y+h, x:x+w] = cv2.resize(crop, (w, h))
+        scenes.append((name, frame, (x, y, w, h)))
+    return scenes
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def run_backend(name, detector, scenes, threshold):
+    # Frames go in as greyscale, as number_plate.py and app.py pass them
+    grays = [(n, cv2.cvtColor(f, cv2.COLOR_BGR2GRAY), t) for n, f, t in scenes]
+    detector.detect(grays[0][1])  # warm-up
+    samples, top1, anyhit, boxes = [], 0, 0, 0
+    for _, gray, truth in grays:
+        start = time.perf_counter()
+        found = detector.detect(gray)
+        samples.append(time.perf_counter() - start)
+        boxes += len(found)
+        top1 += bool(found) and iou(found[0], truth) >= threshold
+        anyhit += any(iou(b, truth) >= threshold for b in found)
+    n = len(grays)
+    ordered = sorted(samples)
+    return {
+        'backend': name,
+        'frames': n,
+        'mean_ms': round(statistics.mean(ordered) * 1000, 3),
+        'p50_ms': round(ordered[n // 2] * 1000, 3),
+        'p95_ms': round(ordered[min(n - 1, int(n * 0.95))] * 1000, 3),
+        'recall_top1': round(top1 / n, 4),
+        'recall_any': round(anyhit / n, 4),
+        'boxes_per_frame': round(boxes / n, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and recall of plate detector backends")
+    parser.add_argument('--corpus', default='plates/plate_img')
+    parser.add_argument('--cascade', default='haarcascade_russian_plate_number.xml')
+    parser.add_argument('--dnn-model', help="ONNX plate detector; the dnn backend is skipped without one")
+    parser.add_argument('--dnn-size', type=int, default=640)
+    parser.add_argument('--video', default='static/videos/parking.mp4', help="background frames")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--search-width', type=int, default=640)
+    parser.add_argument('--roi', help="also run every backend with this ROI (see plate_detector.py)")
+    parser.add_argument('--iou', type=float, default=0.3)
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="write the report here")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    random.seed(args.seed)
+    corpus = load_corpus(args.corpus, args.limit)
+    scenes = make_scenes(corpus, backgrounds(args.video, args.width, args.height, 16, rng), rng)
+    print(f"{len(scenes)} synthetic {args.width}x{args.height} frames from {args.corpus}")
+
+    cascade = cv2.CascadeClassifier(args.cascade)
+    backends = []
+    if not cascade.empty():
+        webcam = CascadeDetector(cascade, **PRESETS['webcam'])
+        backends += [('cascade/webcam', webcam),
+                     ('cascade/upload', CascadeDetector(cascade, **PRESETS['upload'])),
+                     (f'cascade/webcam+scaled{args.search_width}', ScaledSearch(webcam, args.search_width))]
+    else:
+        print(f"cascade: skipped ({args.cascade} not found)")
+    if args.dnn_model:
+        dnn = DnnDetector(args.dnn_model, input_size=args.dnn_size)
+        backends += [('dnn', dnn)]
+    if args.roi:
+        backends += [(f'{name}+roi', RoiMask(d, args.roi)) for name, d in list(backends)]
+
+    report = {'frames': len(scenes), 'size': [args.width, args.height], 'backends': []}
+    for name, detector in backends:
+        result = run_backend(name, detector, scenes, args.iou)
+        report['backends'].append(result)
+        print(f"{name:32s} mean={result['mean_ms']:8.2f}ms p50={result['p50_ms']:8.2f}ms "
+              f"p95={result['p95_ms']:8.2f}ms recall@1={result['recall_top1']:.1%} "
+              f"recall@any={result['recall_any']:.1%} boxes/frame={result['boxes_per_frame']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    return 0 if report['backends'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from allocator import SlotAllocator
+from bench_allocator import summarize
+from lot_layout import RouteTable, build_graph, generate_layout
+from occupancy_store import OccupancyStore
+
+# Scales a generated multi-level lot up to 10k slots and reports what the
+# precomputed route tables cost to build and hold, and how long ranking,
+# path building and a full allocate take at each size. "dijkstra" is the
+# old per-request approach (what parking.cpp does on every call) for
+# comparison; it is only run for a few cars since it grows with the lot.
+
+SIZES = [50, 1000, 5000, 10000]
+
+
+def layout_for(slots, levels, entries, exits):
+    rows_per_level = max(1, slots // (levels * 50))
+    per_row = max(2, slots // (levels * rows_per_level))
+    return generate_layout(levels, rows_per_level, per_row, entries, exits)
+
+
+def table_bytes(table):
+    arrays = [table.slot_ids, table.exit_cost, table.next_hop]
+    arrays += list(table.costs.values()) + list(table.entry_parent.values())
+    return sum(a.itemsize * len(a) for a in arrays)
+
+
+def bench_size(slots, args, workdir):
+    layout = layout_for(slots, args.levels, args.entries, args.exits)
+    start = time.perf_counter()
+    table = RouteTable(layout)
+    build = time.perf_counter() - start
+    print(f"\n{len(table)} slots, {len(table.nodes)} nodes, {args.entries} entries, {args.exits} exits: "
+          f"tables built in {build * 1000:.1f} ms, {table_bytes(table) / 1024:.1f} KiB")
+
+    gates = table.entries
+    cost, path = [], []
+    for i in range(args.cars):
+        gate = gates[i % len(gates)]
+        slot = table.slots[(i * 7919) % len(table)]
+        t = time.perf_counter()
+        table.cost(slot, gate)
+        cost.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        table.path(slot, gate)
+        path.append(time.perf_counter() - t)
+    summarize('cost', cost)
+    summarize('path', path)
+
+    db = os.path.join(workdir, f'occupancy_{slots}.db')
+    allocator = SlotAllocator(OccupancyStore(db), slots_file=os.path.join(workdir, 'slots.txt'), layout=layout)
+    samples = []
+    for i in range(args.cars):
+        t = time.perf_counter()
+        result = allocator.allocate(f'BENCH{i:05d}', gates[i % len(gates)])
+        samples.append(time.perf_counter() - t)
+        if result and i % 2:
+            allocator.free(result['slot'])
+    summarize('allocate', samples)
+
+    g, _ = build_graph(layout)
+    entry = g.node_to_id[gates[0]]
+    samples = []
+    for _ in range(min(args.cars, 5)):
+        t = time.perf_counter()
+        g.dijkstra(entry)
+        samples.append(time.perf_counter() - t)
+    summarize('dijkstra', samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark precomputed lot routes as the lot grows")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="slot counts to try")
+    parser.add_argument('--levels', type=int, default=4)
+    parser.add_argument('--entries', type=int, default=2)
+    parser.add_argument('--exits', type=int, default=2)
+    parser.add_argument('--cars', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='layout_bench_')
+    try:
+        for slots in args.sizes:
+            bench_size(slots, args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
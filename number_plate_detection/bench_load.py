@@ -0,0 +1,282 @@
+import argparse
+import http.client
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_ocr import load_corpus
+from bench_startup import get, wait_for
+
+# Load test for one gate instance. For every gunicorn --workers x --threads
+# combination a fresh app is started under gunicorn.conf.py in a scratch
+# directory (its own occupancy.db, logs and image store, so the real ones are
+# never touched), then driven at each --concurrency level for --duration
+# seconds. Every virtual user replays the labelled plates/plate_img images as
+# gate visits, the way the camera pages do:
+#
+#   POST /upload       the image as image/jpeg (OCR + allocate)
+#   POST /allocate     the plate /upload read (the label if it read nothing)
+#   POST /exit/detect  the same image again (OCR + free)
+#
+# Reported per endpoint and step: p50/p95/p99 latency, throughput, and the
+# share of responses that were errors (5xx or no response), rejections (429
+# from admission control) and misses (other 4xx: no plate read, car not
+# found, lot full). Requests that got no response are broken down by
+# exception; RemoteDisconnected usually means the request sat behind busy
+# threads past gunicorn's keep-alive timeout. After each step the occupancy history is replayed to
+# check that no slot was ever handed to two cars at once and that no car
+# held two slots, and the live table is compared with /api/slots.
+#
+#   python bench_load.py --workers 1 2 --threads 8 16 --concurrency 1 4 16 --json load.json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ['/upload', '/allocate', '/exit/detect']
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def outcome(status):
+    if status is None or status >= 500:
+        return 'error'
+    if status == 429:
+        return 'rejected'
+    if status >= 400:
+        return 'miss'
+    return 'ok'
+
+
+class VirtualUser(threading.Thread):
+    # One keep-alive connection, gate visits back to back until the deadline
+    def __init__(self, port, corpus, offset, deadline, timeout):
+        super().__init__(daemon=True)
+        self.port = port
+        self.corpus = corpus
+        self.offset = offset
+        self.deadline = deadline
+        self.timeout = timeout
+        self.conn = None
+        self.samples = []  # (endpoint, status or None, seconds)
+        self.failures = {}  # exception name -> count, for requests without a response
+        self.visits = 0
+
+    def post(self, path, body, content_type):
+        start = time.perf_counter()
+        status, data = None, {}
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+            self.conn.request('POST', path, body=body, headers={'Content-Type': content_type})
+            response = self.conn.getresponse()
+            raw = response.read()
+            status = response.status
+            if response.will_close:
+                self.conn.close()
+                self.conn = None
+            data = json.loads(raw) if raw else {}
+        except (OSError, http.client.HTTPException) as e:
+            name = type(e).__name__
+            self.failures[name] = self.failures.get(name, 0) + 1
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+        except ValueError:
+            pass
+        self.samples.append((path, status, time.perf_counter() - start))
+        return status, data if isinstance(data, dict) else {}
+
+    def run(self):
+        i = self.offset
+        while time.monotonic() < self.deadline:
+            _, label, image = self.corpus[i % len(self.corpus)]
+            i += 1
+            status, body = self.post('/upload', image, 'image/jpeg')
+            plate = body.get('plate_number') if status == 200 else None
+            self.post('/allocate', json.dumps({'plateNumber': plate or label}), 'application/json')
+            self.post('/exit/detect', image, 'image/jpeg')
+            self.visits += 1
+        if self.conn is not None:
+            self.conn.close()
+
+
+def check_occupancy(db_path, port):
+    # Replays the allocate/free history in commit order; returns a list of
+    # problems (empty when consistent)
+    problems = []
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, timeout=10)
+    try:
+        holder, parked = {}, {}
+        for plate, slot, event in conn.execute("SELECT plate_key, slot, event FROM history ORDER BY id"):
+            if event == 'allocate':
+                if slot in holder:
+                    problems.append(f"slot {slot} allocated to {plate} while held by {holder[slot]}")
+                if plate in parked:
+                    problems.append(f"{plate} allocated {slot} while parked in {parked[plate]}")
+                holder[slot] = plate
+                parked[plate] = slot
+            else:
+                holder.pop(slot, None)
+                parked.pop(plate, None)
+        live = dict(conn.execute("SELECT slot, plate_key FROM occupancy"))
+    finally:
+        conn.close()
+    if live != holder:
+        problems.append(f"occupancy table ({len(live)} cars) disagrees with its history ({len(holder)} cars)")
+    status, snapshot = get(f'http://127.0.0.1:{port}/api/slots', timeout=10)
+    if status != 200:
+        problems.append(f"/api/slots returned {status}")
+    else:
+        shown = {s['slot'] for s in snapshot['slots'] if s['occupied']}
+        if shown != set(live):
+            problems.append(f"/api/slots shows {len(shown)} occupied slots, the store has {len(live)}")
+        unknown = set(live) - {s['slot'] for s in snapshot['slots']}
+        if unknown:
+            problems.append(f"cars parked in slots outside the layout: {sorted(unknown)}")
+    return problems, len(live)
+
+
+def run_step(port, corpus, concurrency, duration, timeout):
+    deadline = time.monotonic() + duration
+    users = [VirtualUser(port, corpus, i * 7, deadline, timeout) for i in range(concurrency)]
+    started = time.perf_counter()
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [s for user in users for s in user.samples]
+    step = {'concurrency': concurrency, 'seconds': round(elapsed, 3),
+            'visits': sum(user.visits for user in users), 'requests': len(samples), 'endpoints': {}}
+    step['visits_per_s'] = round(step['visits'] / elapsed, 2)
+    step['failures'] = {}
+    for user in users:
+        for name, count in user.failures.items():
+            step['failures'][name] = step['failures'].get(name, 0) + count
+    step['requests_per_s'] = round(len(samples) / elapsed, 2)
+    for endpoint in ENDPOINTS + ['all']:
+        rows = [s for s in samples if endpoint in ('all', s[0])]
+        if not rows:
+            continue
+        ordered = sorted(seconds for _, _, seconds in rows)
+        counts = {'ok': 0, 'miss': 0, 'rejected': 0, 'error': 0}
+        for _, status, _ in rows:
+            counts[outcome(status)] += 1
+        step['endpoints'][endpoint] = {
+            'requests': len(rows),
+            'per_s': round(len(rows) / elapsed, 2),
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+            **{f'{k}_rate': round(v / len(rows), 4) for k, v in counts.items()},
+        }
+    return step
+
+
+def start_app(workers, threads, port, workdir, model_loading, timeout):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               MODEL_LOADING=model_loading, PYTHONPATH=HERE,
+               PLATE_CASCADE=os.path.join(HERE, 'haarcascade_russian_plate_number.xml'))
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'wb')
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(HERE, 'gunicorn.conf.py'),
+                               'app:app'], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    url = f'http://127.0.0.1:{port}/ready'
+    try:
+        wait_for(url, (200, 503), time.monotonic() + timeout)
+        if model_loading == 'lazy':
+            # Load the models in every worker up front so the first step is
+            # not measuring model loading; best effort
+            for _ in range(workers * 4):
+                try:
+                    get(url + '?warm=1', timeout=timeout)
+                except OSError:
+                    break
+    except BaseException:
+        master.terminate()
+        master.wait(timeout=30)
+        raise
+    return master
+
+
+def print_step(config, step, problems, parked):
+    print(f"{config} c={step['concurrency']:<3d} {step['visits_per_s']:7.2f} visits/s "
+          f"{step['requests_per_s']:7.2f} req/s, {parked} parked, "
+          + ("occupancy OK" if not problems else f"OCCUPANCY INCONSISTENT: {'; '.join(problems[:3])}"))
+    if step['failures']:
+        print(f"    no response: {step['failures']}")
+    for endpoint, s in step['endpoints'].items():
+        print(f"    {endpoint:12s} n={s['requests']:5d} p50={s['p50_ms']:8.1f}ms p95={s['p95_ms']:8.1f}ms "
+              f"p99={s['p99_ms']:8.1f}ms error={s['error_rate']:.1%} 429={s['rejected_rate']:.1%} "
+              f"miss={s['miss_rate']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp concurrent gate visits against locally started gunicorn apps")
+    parser.add_argument('--corpus', default='plates/plate_img')
+    parser.add_argument('--limit', type=int, default=None, help="images to replay")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--threads', type=int, nargs='+', default=[8, 16])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds per concurrency step")
+    parser.add_argument('--model-loading', choices=['preload', 'lazy'], default='preload')
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--timeout', type=float, default=120.0, help="app start-up and request timeout")
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directories (logs, databases)")
+    parser.add_argument('--json', help="write the report here")
+    args = parser.parse_args()
+
+    corpus = load_corpus(os.path.join(HERE, args.corpus) if not os.path.isabs(args.corpus) else args.corpus,
+                         args.limit)
+    if not corpus:
+        print(f"No labelled images in {args.corpus}")
+        return 1
+    print(f"Replaying {len(corpus)} labelled images from {args.corpus}")
+
+    report = {'images': len(corpus), 'duration': args.duration, 'runs': []}
+    consistent = True
+    for workers in args.workers:
+        for threads in args.threads:
+            config = f"w={workers} t={threads}"
+            workdir = tempfile.mkdtemp(prefix='load_bench_')
+            try:
+                master = start_app(workers, threads, args.port, workdir, args.model_loading, args.timeout)
+            except TimeoutError:
+                print(f"{config}: app did not start, see {workdir}/gunicorn.log")
+                consistent = False
+                continue
+            try:
+                for concurrency in args.concurrency:
+                    step = run_step(args.port, corpus, concurrency, args.duration, args.timeout)
+                    problems, parked = check_occupancy(os.path.join(workdir, 'occupancy.db'), args.port)
+                    consistent = consistent and not problems
+                    step.update({'workers': workers, 'threads': threads, 'parked': parked,
+                                 'occupancy_problems': problems})
+                    report['runs'].append(step)
+                    print_step(config, step, problems, parked)
+            finally:
+                master.terminate()
+                master.wait(timeout=30)
+                if args.keep:
+                    print(f"{config}: scratch directory kept at {workdir}")
+                else:
+                    shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    return 0 if consistent and report['runs'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
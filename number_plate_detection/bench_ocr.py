@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Replays a labelled folder of plate images through both recognition paths
+# and reports per-stage timings, throughput and accuracy:
+#   tesseract - number_plate.py: cascade(1.1, 3, minSize=(60, 20)) ->
+#               preprocess_plate -> Tesseract --psm 7 (tesseract_engine.py)
+#               -> clean_plate_text
+#   easyocr   - app.py /upload: cascade(minNeighbors=5) -> grey 1024x256 ->
+#               reader.readtext -> best result longer than 3 chars
+# The label is the file name without its _YYYYMMDD_HHMMSS suffix, as written
+# by save_plate_image. Those labels are themselves OCR output, so treat the
+# accuracy numbers as relative: good for comparing runs, not as ground truth.
+#
+#   python bench_ocr.py --engines tesseract easyocr --json run.json
+
+LABEL_RE = re.compile(r'^(?P<label>.+)_\d{8}_\d{6}$')
+STAGES = ['decode', 'cascade', 'preprocess', 'ocr', 'cleanup']
+
+
+def normalize(text):
+    return re.sub(r'[^A-Z0-9]', '', text.upper())
+
+
+def load_corpus(folder, limit=None):
+    corpus = []
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in ('.jpg', '.jpeg', '.png'):
+            continue
+        m = LABEL_RE.match(stem)
+        if not m or not normalize(m.group('label')):
+            continue
+        with open(os.path.join(folder, name), 'rb') as f:
+            corpus.append((name, normalize(m.group('label')), f.read()))
+        if limit and len(corpus) >= limit:
+            break
+    return corpus
+
+
+def edit_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def crop_largest(img, boxes):
+    # Corpus images are usually already plate crops, so when the cascade finds
+    # nothing the whole image is used and the miss is only counted.
+    if len(boxes) == 0:
+        return img, False
+    x, y, w, h = sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)[0]
+    return img[y:y+h, x:x+w], True
+
+
+class TesseractPath:
+    name = 'tesseract'
+
+    def __init__(self, cascade_file):
+        import number_plate
+        import tesseract_engine
+        self.np = number_plate
+        self.engine = tesseract_engine.get_engine()  # fails fast if Tesseract is missing
+        self.cascade = cv2.CascadeClassifier(cascade_file)
+
+    def cascade_step(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return crop_largest(img, self.cascade.detectMultiScale(gray, 1.1, 3, minSize=(60, 20)))
+
+    def preprocess(self, crop):
+        return self.np.preprocess_plate(crop)
+
+    def ocr(self, prepared):
+        return self.engine.image_to_string(prepared)
+
+    def cleanup(self, raw):
+        return self.np.clean_plate_text(raw.strip())
+
+
+class EasyOcrPath:
+    name = 'easyocr'
+
+    def __init__(self, cascade_file):
+        import easyocr
+        self.reader = easyocr.Reader(['en'])
+        self.cascade = cv2.CascadeClassifier(cascade_file)
+
+    def cascade_step(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return crop_largest(img, self.cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5))
+
+    def preprocess(self, crop):
+        return cv2.resize(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), (1024, 256))
+
+    def ocr(self, prepared):
+        return self.reader.readtext(prepared)
+
+    def cleanup(self, results):
+        for (_, text, _) in sorted(results, key=lambda x: x[2], reverse=True):
+            if len(text) > 3:
+                return normalize(text.strip().replace(" ", ""))
+        return ""
+
+
+def run_engine(path, corpus):
+    timings = {stage: [] for stage in STAGES}
+    rows = []
+    exact = 0
+    cascade_hits = 0
+    char_errors = 0
+    label_chars = 0
+    started = time.perf_counter()
+
+    for name, label, data in corpus:
+        t0 = time.perf_counter()
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        t1 = time.perf_counter()
+        if img is None:
+            continue
+        crop, hit = path.cascade_step(img)
+        t2 = time.perf_counter()
+        prepared = path.preprocess(crop)
+        t3 = time.perf_counter()
+        raw = path.ocr(prepared)
+        t4 = time.perf_counter()
+        text = path.cleanup(raw)
+        t5 = time.perf_counter()
+
+        for stage, seconds in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+            timings[stage].append(seconds)
+        distance = edit_distance(text, label)
+        exact += text == label
+        cascade_hits += hit
+        char_errors += distance
+        label_chars += len(label)
+        rows.append({'file': name, 'label': label, 'prediction': text,
+                     'cascade_hit': hit, 'edit_distance': distance,
+                     'ms': round((t5 - t0) * 1000, 3)})
+
+    elapsed = time.perf_counter() - started
+    n = len(rows)
+
+    def summary(samples):
+        if not samples:
+            return {}
+        ordered = sorted(samples)
+        return {'mean_ms': round(statistics.mean(ordered) * 1000, 3),
+                'p50_ms': round(ordered[len(ordered) // 2] * 1000, 3),
+                'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3)}
+
+    return {
+        'engine': path.name,
+        'images': n,
+        'seconds': round(elapsed, 3),
+        'throughput_ips': round(n / elapsed, 2) if elapsed else 0.0,
+        'exact_match': round(exact / n, 4) if n else 0.0,
+        'cer': round(char_errors / label_chars, 4) if label_chars else 0.0,
+        'cascade_hit_rate': round(cascade_hits / n, 4) if n else 0.0,
+        'stages': {stage: summary(samples) for stage, samples in timings.items()},
+        'results': rows,
+    }
+
+
+ENGINES = {'tesseract': TesseractPath, 'easyocr': EasyOcrPath}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy and latency benchmark over a labelled plate corpus")
+    parser.add_argument('--corpus', default='plates/plate_img')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=['tesseract', 'easyocr'])
+    parser.add_argument('--cascade', default='haarcascade_russian_plate_number.xml')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--json', help="write the full report (including per-image results) here")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.limit)
+    print(f"Corpus: {len(corpus)} labelled images from {args.corpus}")
+
+    report = {'corpus': args.corpus, 'images': len(corpus), 'engines': []}
+    for engine in args.engines:
+        try:
+            path = ENGINES[engine](args.cascade)
+        except (ImportError, OSError) as e:
+            print(f"{engine}: skipped ({e})")
+            continue
+        result = run_engine(path, corpus)
+        report['engines'].append(result)
+
+        print(f"{engine}: {result['images']} images in {result['seconds']}s "
+              f"({result['throughput_ips']} img/s), exact={result['exact_match']:.1%} "
+              f"cer={result['cer']:.3f} cascade_hits={result['cascade_hit_rate']:.1%}")
+        for stage in STAGES:
+            s = result['stages'][stage]
+            if s:
+                print(f"  {stage:10s} mean={s['mean_ms']:9.3f}ms p50={s['p50_ms']:9.3f}ms p95={s['p95_ms']:9.3f}ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    return 0 if report['engines'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Measures cold start and per-worker memory of the gunicorn deployment in both
+# MODEL_LOADING modes. Linux only (reads /proc). Run from this directory:
+#   python bench_startup.py --workers 2
+# RSS counts shared pages in every worker; PSS splits them between the
+# processes sharing them, so it shows what copy-on-write actually saves.
+
+
+def children(pid):
+    kids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            kids.append(int(entry))
+    return kids
+
+
+def memory_kb(pid):
+    mem = {}
+    for name, key in (('status', 'VmRSS:'), ('smaps_rollup', 'Pss:')):
+        try:
+            with open(f'/proc/{pid}/{name}') as f:
+                for line in f:
+                    if line.startswith(key):
+                        mem[key.rstrip(':').lower().replace('vm', '')] = int(line.split()[1])
+                        break
+        except OSError:
+            pass
+    return mem
+
+
+def get(url, timeout=2):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            status, body = r.status, r.read()
+    except urllib.error.HTTPError as e:
+        status, body = e.code, e.read()
+    try:
+        return status, json.loads(body)
+    except ValueError:
+        return status, {}
+
+
+def wait_for(url, accept, deadline):
+    while time.monotonic() < deadline:
+        try:
+            status, body = get(url)
+            if status in accept:
+                return status, body
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(url)
+
+
+def report(label, master, started, **extra):
+    workers = children(master.pid)
+    mems = [memory_kb(w) for w in workers]
+    row = {
+        'step': label,
+        'seconds': round(time.monotonic() - started, 3),
+        'master': memory_kb(master.pid),
+        'workers': mems,
+        'worker_rss_mb_avg': round(sum(m.get('rss', 0) for m in mems) / max(len(mems), 1) / 1024, 1),
+        'worker_pss_mb_total': round(sum(m.get('pss', 0) for m in mems) / 1024, 1),
+    }
+    row.update(extra)
+    print(json.dumps(row))
+    return row
+
+
+def run_mode(mode, port, workers, timeout):
+    env = dict(os.environ, MODEL_LOADING=mode, PORT=str(port), WEB_CONCURRENCY=str(workers))
+    started = time.monotonic()
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}/ready'
+    deadline = started + timeout
+    try:
+        print(f'# MODEL_LOADING={mode}')
+        if mode == 'preload':
+            wait_for(url, (200,), deadline)
+            report('ready', master, started)
+        else:
+            wait_for(url, (200, 503), deadline)
+            report('serving', master, started)
+            # Each warm request lands on some worker; keep going until all are warm
+            warm = set()
+            while len(warm) < workers and time.monotonic() < deadline:
+                status, body = get(url + '?warm=1', timeout=timeout)
+                if status == 200:
+                    warm.add(body.get('pid'))
+            report('ready', master, started, warm_workers=len(warm))
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time and per-worker memory for each model loading mode")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--modes', nargs='+', default=['preload', 'lazy'])
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        run_mode(mode, args.port, args.workers, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
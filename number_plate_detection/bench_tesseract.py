@@ -0,0 +1,119 @@
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import tesseract_engine
+from bench_allocator import summarize
+from bench_ocr import load_corpus
+from number_plate import clean_plate_text, preprocess_plate
+
+# Per-call latency of the Tesseract engines (tesseract_engine.py) on the
+# preprocessed plate crops read_plate would hand them. "spawn" is the old
+# one-process-per-image pytesseract call; the others keep the model loaded.
+# Each engine is also run from --threads threads to show what the handle
+# pool buys when several lanes share a process. Readings are compared with
+# spawn's, so a binding that is configured differently shows up as mismatches.
+#
+#   python bench_tesseract.py --engines spawn capi tesserocr --json tesseract.json
+
+
+def prepare(corpus):
+    images = []
+    for name, _, data in corpus:
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            images.append((name, preprocess_plate(img)))
+    return images
+
+
+def timed(engine, image):
+    start = time.perf_counter()
+    text = engine.image_to_string(image)
+    return time.perf_counter() - start, clean_plate_text(text.strip())
+
+
+def run_engine(name, images, threads):
+    start = time.perf_counter()
+    engine = tesseract_engine.ENGINES[name]()
+    load = time.perf_counter() - start
+    timed(engine, images[0][1])  # warm-up
+
+    samples, readings = [], {}
+    for image_name, image in images:
+        seconds, text = timed(engine, image)
+        samples.append(seconds)
+        readings[image_name] = text
+    summarize(name, samples)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda item: timed(engine, item[1]), images))
+    parallel = time.perf_counter() - start
+    engine.close()
+
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        'engine': name,
+        'images': n,
+        'load_ms': round(load * 1000, 3),
+        'mean_ms': round(sum(ordered) / n * 1000, 3),
+        'p50_ms': round(ordered[n // 2] * 1000, 3),
+        'p95_ms': round(ordered[min(n - 1, int(n * 0.95))] * 1000, 3),
+        'serial_ips': round(n / sum(ordered), 2),
+        'threads': threads,
+        'threaded_ips': round(n / parallel, 2),
+    }, readings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call latency of spawned vs persistent Tesseract")
+    parser.add_argument('--corpus', default='plates/plate_img')
+    parser.add_argument('--engines', nargs='+', choices=sorted(tesseract_engine.ENGINES),
+                        default=['spawn', 'capi', 'tesserocr'])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--json', help="write the report here")
+    args = parser.parse_args()
+
+    images = prepare(load_corpus(args.corpus, args.limit))
+    print(f"{len(images)} preprocessed plate crops from {args.corpus}")
+    if not images:
+        return 1
+
+    report = {'images': len(images), 'engines': []}
+    baseline = None
+    for name in args.engines:
+        try:
+            result, readings = run_engine(name, images, args.threads)
+        except (ImportError, OSError, RuntimeError, tesseract_engine.pytesseract.TesseractNotFoundError) as e:
+            print(f"{name:12s} skipped ({e})")
+            continue
+        if baseline is None and name == 'spawn':
+            baseline = readings
+        if baseline is not None and name != 'spawn':
+            result['mismatches_vs_spawn'] = sum(readings[k] != v for k, v in baseline.items())
+        report['engines'].append(result)
+        print(f"{'':12s} load={result['load_ms']:.1f}ms serial={result['serial_ips']} img/s "
+              f"{args.threads} threads={result['threaded_ips']} img/s"
+              + (f" mismatches={result['mismatches_vs_spawn']}" if 'mismatches_vs_spawn' in result else ""))
+
+    spawn = next((r for r in report['engines'] if r['engine'] == 'spawn'), None)
+    for result in report['engines']:
+        if spawn and result is not spawn:
+            print(f"{result['engine']}: {spawn['mean_ms'] / result['mean_ms']:.1f}x faster per call than spawn")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    return 0 if report['engines'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
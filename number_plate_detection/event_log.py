@@ -0,0 +1,228 @@
+import atexit
+import csv
+import gzip
+import io
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import date, datetime
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# One append-only event log for gate activity, replacing the separate
+# vehicle_logs.csv / exit_logs.csv writers that opened a CSV per row.
+#
+# record() only formats a row and puts it on a queue. A background thread
+# collects rows for up to flush_ms (or batch_size rows) and appends the whole
+# batch with a single write() on an O_APPEND descriptor, so several gunicorn
+# workers or camera lanes can share the file. The live file is rotated when
+# it passes max_bytes or on the first write of a new day; rotated files are
+# gzipped into <dir>/archive/events-<stamp>.csv.gz.
+#
+# Durability:
+#   - A row is in memory only until its batch is written (at most flush_ms,
+#     500 ms by default). A process crash loses those rows; a clean exit
+#     flushes them (atexit, or close() in worker processes).
+#   - Once written, rows are in the OS page cache and survive a process
+#     crash. With EVENT_LOG_FSYNC=1 every batch is fsync'd, so they also
+#     survive a power loss, at the cost of one fsync per batch.
+#   - Rotation renames the live file first and compresses afterwards. A crash
+#     in between leaves an uncompressed events-<stamp>.csv in the archive,
+#     which is compressed the next time a writer starts.
+
+FIELDS = ['Timestamp', 'Event', 'Plate', 'Slot', 'Gate', 'Source']
+
+LOG_DIR = os.environ.get('EVENT_LOG_DIR', 'logs')
+
+rows_written = metrics.registry.register(metrics.Counter(
+    'event_log_rows_total', 'Rows appended to the event log', ('event',)))
+batches_written = metrics.registry.register(metrics.Counter(
+    'event_log_batches_total', 'Batched writes to the event log'))
+
+
+def timestamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def format_row(event, plate, slot='', gate='', source='', at=None):
+    buf = io.StringIO()
+    csv.writer(buf).writerow([at or timestamp(), event, plate.strip().replace(" ", ""),
+                              slot or '', gate or '', source or ''])
+    return buf.getvalue()
+
+
+class EventLog:
+    def __init__(self, log_dir=LOG_DIR, name='events', batch_size=200, flush_ms=500.0,
+                 max_bytes=16 * 1024 * 1024, fsync=False):
+        self.log_dir = log_dir
+        self.name = name
+        self.path = os.path.join(log_dir, f'{name}.csv')
+        self.archive_dir = os.path.join(log_dir, 'archive')
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_ms)) / 1000.0
+        self.max_bytes = int(max_bytes)
+        self.fsync = fsync
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.rows = 0
+        self.batches = 0
+        self.rotations = 0
+
+    def _ensure_worker(self):
+        # Started on first use (and again after a fork), like BatchedReader
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                os.makedirs(self.archive_dir, exist_ok=True)
+                with self.file_lock():
+                    self._compress_leftovers()
+                self.queue = queue.Queue()
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name=f'{self.name}-log', daemon=True)
+                self.thread.start()
+
+    def record(self, event, plate, slot='', gate='', source=''):
+        # Returns immediately; the row is written by the background thread
+        self._ensure_worker()
+        self.queue.put((event, format_row(event, plate, slot, gate, source)))
+
+    def flush(self, timeout=None):
+        # Blocks until every row recorded so far is written
+        if self.thread is None or self.pid != os.getpid():
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        return self.flush(timeout)
+
+    def stats(self):
+        return {'rows': self.rows, 'batches': self.batches, 'rotations': self.rotations,
+                'pending': self.queue.qsize()}
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not isinstance(batch[-1], threading.Event):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            rows = [item for item in batch if not isinstance(item, threading.Event)]
+            if rows:
+                try:
+                    with metrics.stage('log_write'):
+                        self._write(rows)
+                except OSError as e:
+                    # Keep the thread alive; the next batch retries the file
+                    print(f"Event log write failed, {len(rows)} rows lost: {e}")
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, rows):
+        data = ''.join(line for _, line in rows).encode('utf-8')
+        with self.file_lock():
+            self._rotate_if_needed(len(data))
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size == 0:
+                    data = (','.join(FIELDS) + '\r\n').encode('utf-8') + data
+                os.write(fd, data)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+        self.rows += len(rows)
+        self.batches += 1
+        batches_written.inc()
+        for event, _ in rows:
+            rows_written.inc(event=event)
+
+    def file_lock(self):
+        # Held by writers around append and rotation (and by record_index to
+        # keep rotations out of a refresh)
+        return _FileLock(self.path + '.lock')
+
+    def _rotate_if_needed(self, incoming):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        written_on = date.fromtimestamp(st.st_mtime)
+        if st.st_size and (written_on != date.today() or st.st_size + incoming > self.max_bytes):
+            self._rotate(written_on)
+
+    def _rotate(self, written_on):
+        stamp = datetime.now().strftime('%H%M%S')
+        base = os.path.join(self.archive_dir, f'{self.name}-{written_on:%Y%m%d}-{stamp}')
+        target, n = base + '.csv', 1
+        while os.path.exists(target) or os.path.exists(target + '.gz'):
+            target, n = f'{base}-{n}.csv', n + 1
+        os.replace(self.path, target)
+        self._compress(target)
+        self.rotations += 1
+
+    def _compress(self, path):
+        tmp = path + '.gz.tmp'
+        with open(path, 'rb') as src, gzip.open(tmp, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, path + '.gz')
+        os.remove(path)
+
+    def _compress_leftovers(self):
+        for entry in os.listdir(self.archive_dir):
+            path = os.path.join(self.archive_dir, entry)
+            if entry.endswith('.gz.tmp'):
+                os.remove(path)
+            elif entry.endswith('.csv'):
+                self._compress(path)
+
+
+class _FileLock:
+    # Cross-process lock around rotation and append; a no-op without fcntl
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+events = EventLog(batch_size=int(os.environ.get('EVENT_LOG_BATCH', 200)),
+                  flush_ms=float(os.environ.get('EVENT_LOG_FLUSH_MS', 500)),
+                  max_bytes=int(os.environ.get('EVENT_LOG_MAX_BYTES', 16 * 1024 * 1024)),
+                  fsync=os.environ.get('EVENT_LOG_FSYNC', '0') == '1')
+atexit.register(events.close)
+
+
+def record(event, plate, slot='', gate='', source=''):
+    events.record(event, plate, slot, gate, source)
@@ -0,0 +1,29 @@
+import gc
+import os
+
+# gunicorn -c gunicorn.conf.py app:app
+#
+# MODEL_LOADING=preload (default) imports the app, and so loads EasyOCR and the
+# cascade, once in the master before forking; workers then share those pages
+# copy-on-write. MODEL_LOADING=lazy boots workers without models and each one
+# loads them on its first recognition request.
+#
+# Recognition requests waiting in admission.py's queue hold a thread, so
+# threads should exceed RECOGNITION_CONCURRENCY + RECOGNITION_QUEUE +
+# SSE_MAX_CLIENTS (8 + 2 + 2 by default; concurrency follows OCR_MAX_BATCH)
+# with some left for cheap routes.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '16'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+
+preload_app = os.environ.get('MODEL_LOADING', 'preload').lower() == 'preload'
+
+
+def when_ready(server):
+    # Move everything allocated during preload into the permanent generation
+    # so the collector in each worker does not write to (and so un-share)
+    # those objects.
+    if preload_app:
+        gc.freeze()
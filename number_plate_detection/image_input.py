@@ -0,0 +1,239 @@
+import base64
+import binascii
+import io
+import os
+import tempfile
+
+import cv2
+import numpy as np
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Decodes the camera frame from an incoming request. Three body formats are
+# accepted by /upload and /exit/detect:
+#   - application/json {"image": "data:image/jpeg;base64,..."}  (camera pages)
+#   - a raw image body, e.g. Content-Type: image/jpeg
+#   - multipart/form-data with the file in the "image" field
+# Raw bodies are read straight into one preallocated buffer and handed to
+# cv2.imdecode through np.frombuffer, without intermediate copies. Multipart
+# parts are necessarily buffered once by werkzeug's form parser; with
+# UploadRequest as the app's request class image parts are parsed into
+# memory, and part_buffer decodes them from that buffer without another copy.
+#
+# /upload/burst takes several frames instead (iter_request_frames):
+#   - application/json {"images": ["data:image/jpeg;base64,...", ...]}
+#   - multipart/form-data with any number of image or video files
+#   - a raw video body, e.g. Content-Type: video/mp4 or video/webm
+# Frames are decoded one at a time as the caller asks for them, so a caller
+# that has seen enough can stop without decoding the rest. Videos are spooled
+# to a temporary file (OpenCV cannot read them from memory) and only every
+# stride-th frame is decoded.
+#
+# Bodies are capped at the app's MAX_CONTENT_LENGTH (req.max_content_length):
+# a declared length over the cap is refused before any buffer is allocated,
+# and chunked bodies stop growing once they pass it. Both raise werkzeug's
+# RequestEntityTooLarge (413).
+
+CHUNK_SIZE = 64 * 1024
+
+
+def check_length(length, limit):
+    if limit is not None and length is not None and length > limit:
+        raise RequestEntityTooLarge(f"Body of {length} bytes exceeds the {limit} byte limit")
+
+
+def read_into_buffer(stream, length=None, limit=None):
+    check_length(length, limit)
+    if not hasattr(stream, 'readinto'):
+        data = stream.read() if limit is None else stream.read(limit + 1)
+        check_length(len(data), limit)
+        return memoryview(data)
+
+    if length:
+        buf = bytearray(length)
+        view = memoryview(buf)
+        filled = 0
+        while filled < length:
+            n = stream.readinto(view[filled:])
+            if not n:
+                break
+            filled += n
+        return view[:filled]
+
+    # Unknown length (chunked transfer): grow the buffer as data arrives
+    buf = bytearray()
+    chunk = bytearray(CHUNK_SIZE)
+    while True:
+        n = stream.readinto(chunk)
+        if not n:
+            break
+        buf += memoryview(chunk)[:n]
+        check_length(len(buf), limit)
+    return memoryview(buf)
+
+
+def copy_stream(stream, f, length=None, limit=None):
+    # Like read_into_buffer, but straight to a file in CHUNK_SIZE pieces
+    check_length(length, limit)
+    copied = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        copied += len(chunk)
+        check_length(copied, limit)
+        f.write(chunk)
+    return copied
+
+
+class UploadRequest(Request):
+    # Image parts are parsed into a BytesIO rather than werkzeug's spooled
+    # temporary file (on disk past 500KB), so part_buffer can view them in
+    # place. The whole body is already capped by MAX_CONTENT_LENGTH. Video
+    # parts keep the default: they are copied to a file for OpenCV anyway.
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if (content_type or '').startswith('video/'):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return io.BytesIO()
+
+
+def part_buffer(stream, limit=None):
+    # A parsed multipart part: a view of its buffer when it is in memory,
+    # otherwise read into one preallocated buffer
+    if isinstance(stream, io.BytesIO):
+        view = stream.getbuffer()[stream.tell():]
+        check_length(len(view), limit)
+        return view
+    return read_into_buffer(stream, file_stream_length(stream), limit)
+
+
+def decode_part(stream, limit=None):
+    # The view is released before the part is closed, which BytesIO refuses
+    # while its buffer is exported
+    with part_buffer(stream, limit) as buf:
+        return decode_buffer(buf)
+
+
+def decode_buffer(buf):
+    if len(buf) == 0:
+        return None
+    return cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR)
+
+
+def decode_data_url(data_url):
+    comma = data_url.find(',')
+    if comma < 0:
+        return None
+    try:
+        img_bytes = base64.b64decode(data_url[comma + 1:])
+    except (binascii.Error, ValueError):
+        return None
+    return decode_buffer(img_bytes)
+
+
+def file_stream_length(stream):
+    try:
+        pos = stream.tell()
+        stream.seek(0, 2)
+        end = stream.tell()
+        stream.seek(pos)
+        return end - pos
+    except (AttributeError, OSError):
+        return None
+
+
+def decode_request_image(req):
+    # Returns (image, None) on success or (None, error message)
+    mimetype = req.mimetype or ''
+
+    if req.is_json:
+        data = req.get_json(silent=True) or {}
+        img_data = data.get('image', '')
+        if not img_data:
+            return None, 'No image data provided'
+        if not isinstance(img_data, str) or ',' not in img_data:
+            return None, 'Invalid image data'
+        img = decode_data_url(img_data)
+
+    elif mimetype == 'multipart/form-data':
+        upload = req.files.get('image') or next(iter(req.files.values()), None)
+        if upload is None:
+            return None, 'No image data provided'
+        img = decode_part(upload.stream, req.max_content_length)
+
+    elif mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        img = decode_buffer(read_into_buffer(req.stream, req.content_length, req.max_content_length))
+
+    else:
+        return None, 'Unsupported Content-Type, send JSON, multipart or image/* body'
+
+    if img is None:
+        return None, 'Failed to decode image'
+    return img, None
+
+
+def iter_video_frames(stream, stride=1, length=None, limit=None):
+    # Frames of a video read from a file-like stream; the temporary copy is
+    # removed when the generator is exhausted or closed
+    fd, path = tempfile.mkstemp(prefix='burst_', suffix='.video')
+    cap = None
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            copy_stream(stream, f, length, limit)
+        cap = cv2.VideoCapture(path)
+        index = 0
+        while True:
+            if index % stride:
+                if not cap.grab():
+                    break
+            else:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                yield frame
+            index += 1
+    finally:
+        if cap is not None:
+            cap.release()
+        os.remove(path)
+
+
+def iter_request_frames(req, stride=1, max_frames=30):
+    # Yields decoded frames (undecodable ones are skipped), at most max_frames
+    stride = max(1, int(stride))
+    limit = req.max_content_length
+    mimetype = req.mimetype or ''
+    if req.is_json:
+        data = req.get_json(silent=True) or {}
+        items = data.get('images') or ([data['image']] if data.get('image') else [])
+        frames = (decode_data_url(item) for item in items if isinstance(item, str))
+    elif mimetype == 'multipart/form-data':
+        frames = multipart_frames(req.files, stride, limit)
+    elif mimetype.startswith('video/') or mimetype == 'application/octet-stream':
+        frames = iter_video_frames(req.stream, stride, req.content_length, limit)
+    elif mimetype.startswith('image/'):
+        frames = iter([decode_buffer(read_into_buffer(req.stream, req.content_length, limit))])
+    else:
+        return
+
+    count = 0
+    try:
+        for frame in frames:
+            if frame is None:
+                continue
+            yield frame
+            count += 1
+            if count >= max_frames:
+                break
+    finally:
+        if hasattr(frames, 'close'):
+            frames.close()
+
+
+def multipart_frames(files, stride, limit=None):
+    # Every uploaded file in order, whatever its field name
+    for _, upload in files.items(multi=True):
+        if (upload.mimetype or '').startswith('video/'):
+            yield from iter_video_frames(upload.stream, stride, file_stream_length(upload.stream), limit)
+        else:
+            yield decode_part(upload.stream, limit)
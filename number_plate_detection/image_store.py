@@ -0,0 +1,277 @@
+import atexit
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import cv2
+
+import metrics
+from occupancy_store import normalize_plate
+
+# Content-addressed store for plate crops, replacing the synchronous
+# cv2.imwrite into the flat plates/plate_img folder.
+#
+# save() only queues the crop. A background thread downscales it (longest
+# side at most IMAGE_MAX_SIDE), encodes it as JPEG (IMAGE_JPEG_QUALITY),
+# names the file after the SHA-1 of the encoded bytes and writes it to
+# <root>/<ab>/<cd>/<sha1>.jpg, so no directory holds more than a few hundred
+# files and identical crops are stored once. OCR text never ends up in a
+# file name. A small SQLite index (<root>/index.db) maps plate and time to
+# the image. Rows older than IMAGE_RETENTION_DAYS are pruned about once an
+# hour, and a file is deleted once no row refers to it.
+#
+# If the writer falls behind by more than the queue size, new crops are
+# dropped (and counted) rather than slowing down the gate.
+
+ROOT = os.environ.get('IMAGE_STORE_DIR', 'plates/store')
+PRUNE_INTERVAL = 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plate TEXT NOT NULL,
+    plate_key TEXT NOT NULL,
+    at TEXT NOT NULL,
+    sha1 TEXT NOT NULL,
+    source TEXT NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_plate_idx ON images (plate_key, at);
+CREATE INDEX IF NOT EXISTS images_at_idx ON images (at);
+CREATE INDEX IF NOT EXISTS images_sha1_idx ON images (sha1);
+"""
+
+saved = metrics.registry.register(metrics.Counter(
+    'image_store_saved_total', 'Plate crops written to the image store, by whether the file was new', ('result',)))
+dropped = metrics.registry.register(metrics.Counter(
+    'image_store_dropped_total', 'Plate crops dropped because the image writer queue was full'))
+
+
+def now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def shard_path(sha1):
+    return os.path.join(sha1[:2], sha1[2:4], sha1 + '.jpg')
+
+
+class ImageStore:
+    def __init__(self, root=ROOT, quality=90, max_side=1024, retention_days=30, max_queue=256):
+        self.root = root
+        self.quality = int(quality)
+        self.max_side = int(max_side)
+        self.retention_days = float(retention_days)
+        self.max_queue = max(1, int(max_queue))
+        self.db_path = os.path.join(root, 'index.db')
+        self.queue = queue.Queue(self.max_queue)
+        self.lock = threading.RLock()
+        self.thread = None
+        self.pid = None
+        self._conn = None
+        self._conn_pid = None
+        self.last_prune = 0.0
+
+    def conn(self):
+        # One connection per process, as in OccupancyStore
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def transaction(self):
+        # Writes and prunes both take the write lock first, so a prune can
+        # never delete a file another worker has just decided to reuse
+        with self.lock:
+            conn = self.conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _ensure_worker(self):
+        # Started on first use (and again after a fork), like BatchedReader
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.queue = queue.Queue(self.max_queue)
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name='image-store', daemon=True)
+                self.thread.start()
+
+    def save(self, image, plate, source='upload'):
+        # Returns a Future for the stored path (relative to root), or None if
+        # the crop was dropped. The image must not be modified afterwards.
+        self._ensure_worker()
+        future = Future()
+        try:
+            self.queue.put_nowait((image, plate, source, now(), future))
+        except queue.Full:
+            dropped.inc()
+            return None
+        return future
+
+    def flush(self, timeout=None):
+        if self.thread is None or self.pid != os.getpid():
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        return self.flush(timeout)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            image, plate, source, at, future = item
+            try:
+                with metrics.stage('image_write'):
+                    path = self.write(image, plate, source, at)
+                future.set_result(path)
+            except Exception as e:
+                print(f"Image store write failed for {plate}: {e}")
+                future.set_exception(e)
+            if self.retention_days and time.monotonic() - self.last_prune > PRUNE_INTERVAL:
+                self.last_prune = time.monotonic()
+                try:
+                    self.prune()
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Image store prune failed: {e}")
+
+    def encode(self, image):
+        h, w = image.shape[:2]
+        if self.max_side and max(h, w) > self.max_side:
+            scale = self.max_side / max(h, w)
+            image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return buf.tobytes()
+
+    def write(self, image, plate, source='upload', at=None):
+        # Synchronous store; returns the path relative to root
+        data = self.encode(image)
+        sha1 = hashlib.sha1(data).hexdigest()
+        rel = shard_path(sha1)
+        full = os.path.join(self.root, rel)
+        with self.transaction() as conn:
+            new = not os.path.exists(full)
+            if new:
+                os.makedirs(os.path.dirname(full), exist_ok=True)
+                tmp = f'{full}.{os.getpid()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, full)
+            conn.execute("INSERT INTO images (plate, plate_key, at, sha1, source, bytes) VALUES (?, ?, ?, ?, ?, ?)",
+                         (plate, normalize_plate(plate), at or now(), sha1, source, len(data)))
+        saved.inc(result='new' if new else 'duplicate')
+        return rel
+
+    def lookup(self, plate=None, start=None, end=None, limit=20):
+        # Newest first: [{'plate', 'time', 'path', 'source', 'bytes'}]
+        where, params = [], []
+        if plate:
+            where.append("plate_key = ?")
+            params.append(normalize_plate(plate))
+        if start:
+            where.append("at >= ?")
+            params.append(start)
+        if end:
+            where.append("at <= ?")
+            params.append(end)
+        sql = "SELECT plate, at, sha1, source, bytes FROM images"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY at DESC, id DESC LIMIT ?"
+        with self.lock:
+            rows = self.conn().execute(sql, params + [int(limit)]).fetchall()
+        return [{'plate': p, 'time': at, 'path': os.path.join(self.root, shard_path(sha1)),
+                 'source': source, 'bytes': size} for p, at, sha1, source, size in rows]
+
+    def prune(self, retention_days=None):
+        # Drops index rows past retention and files no row refers to any
+        # more; returns (rows, files) removed. 0 days keeps everything.
+        days = self.retention_days if retention_days is None else retention_days
+        if days <= 0:
+            return 0, 0  # keep forever
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        with self.transaction() as conn:
+            expired = [r[0] for r in conn.execute("SELECT DISTINCT sha1 FROM images WHERE at < ?", (cutoff,))]
+            rows = conn.execute("DELETE FROM images WHERE at < ?", (cutoff,)).rowcount
+            files = 0
+            for sha1 in expired:
+                if conn.execute("SELECT 1 FROM images WHERE sha1 = ? LIMIT 1", (sha1,)).fetchone():
+                    continue
+                try:
+                    os.remove(os.path.join(self.root, shard_path(sha1)))
+                    files += 1
+                except FileNotFoundError:
+                    pass
+        return rows, files
+
+    def import_folder(self, folder):
+        # One-off import of the old flat plates/plate_img files, named
+        # <plate>_<YYYYMMDD>_<HHMMSS>.jpg; the originals are left in place
+        imported = 0
+        for name in sorted(os.listdir(folder)):
+            stem, ext = os.path.splitext(name)
+            m = LEGACY_NAME_RE.match(stem)
+            image = cv2.imread(os.path.join(folder, name)) if ext.lower() in ('.jpg', '.jpeg', '.png') else None
+            if image is None:
+                continue
+            if m and m.group('date'):
+                at = datetime.strptime(m.group('date') + m.group('time'), '%Y%m%d%H%M%S').strftime("%Y-%m-%d %H:%M:%S")
+            else:
+                at = datetime.fromtimestamp(os.path.getmtime(os.path.join(folder, name))).strftime("%Y-%m-%d %H:%M:%S")
+            self.write(image, m.group('plate') if m else stem, source='import', at=at)
+            imported += 1
+        return imported
+
+
+# "<plate>_YYYYMMDD_HHMMSS" (app.py) or "detected_[lane_]<plate>_<count>" (webcam)
+LEGACY_NAME_RE = re.compile(r'^(?:detected_)?(?P<plate>.+?)(?:_(?P<date>\d{8})_(?P<time>\d{6})|_\d+)$')
+
+images = ImageStore(quality=int(os.environ.get('IMAGE_JPEG_QUALITY', 90)),
+                    max_side=int(os.environ.get('IMAGE_MAX_SIDE', 1024)),
+                    retention_days=float(os.environ.get('IMAGE_RETENTION_DAYS', 30)),
+                    max_queue=int(os.environ.get('IMAGE_QUEUE_SIZE', 256)))
+atexit.register(images.close)
+
+
+if __name__ == '__main__':
+    # python image_store.py import [plates/plate_img] | prune [days] | lookup <plate>
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'import':
+        folder = sys.argv[2] if len(sys.argv) > 2 else 'plates/plate_img'
+        print(f"Imported {images.import_folder(folder)} images from {folder}")
+    elif command == 'prune':
+        rows, files = images.prune(float(sys.argv[2]) if len(sys.argv) > 2 else None)
+        print(f"Pruned {rows} index rows and {files} files")
+    elif command == 'lookup' and len(sys.argv) > 2:
+        for row in images.lookup(sys.argv[2], limit=100):
+            print(row['time'], row['plate'], row['path'])
+    else:
+        print("Usage: python image_store.py import [folder] | prune [days] | lookup <plate>")
+        sys.exit(1)
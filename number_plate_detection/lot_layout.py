@@ -0,0 +1,257 @@
+import heapq
+import json
+import os
+import sys
+from array import array
+
+# Lot layouts and the route tables the allocator ranks slots with.
+#
+# A layout is a JSON file (LOT_LAYOUT=<path>) with gates, rows of slots and
+# any extra edges, e.g. ramps between levels. All edges are one-way, as in
+# parking.cpp:
+#
+#   {
+#     "entries": ["Entry"],
+#     "exits": ["Exit"],
+#     "rows": [
+#       {"name": "a", "slots": 10, "head": ["Entry", 1], "tail": ["Exit", 1],
+#        "links": [[1, 6], [5, 10]]}
+#     ],
+#     "edges": [["Entry", "L2", 4], ["L2", "L2a1", 1]],
+#     "slots": []
+#   }
+#
+# A row named "a" with 10 slots is a1 -> a2 -> ... -> a10 (cost "step",
+# default 1); "head" is the edge into its first slot, "tail" the edge out of
+# its last one, and "links" are shortcuts between slot numbers (cost 1).
+# "slots" lists slot nodes that are wired up through "edges" only.
+#
+# RouteTable runs Dijkstra once from each entry and once backwards from the
+# exits, and keeps only the results: per-entry slot costs plus shortest-path
+# parent arrays. Ranking a slot is then an array lookup and a route is a walk
+# along two parent arrays, however big the lot is.
+
+ROWS = ['a', 'b', 'c', 'd', 'e']
+SLOTS_PER_ROW = 10
+
+INF = float('inf')
+
+
+class Graph:
+    def __init__(self):
+        self.node_to_id = {}
+        self.id_to_node = []
+        self.adj = []
+
+    def add_node(self, name):
+        if name not in self.node_to_id:
+            self.node_to_id[name] = len(self.id_to_node)
+            self.id_to_node.append(name)
+            self.adj.append([])
+
+    def add_edge(self, src, dst, weight):
+        self.add_node(src)
+        self.add_node(dst)
+        self.adj[self.node_to_id[src]].append((self.node_to_id[dst], weight))
+
+    def reversed(self):
+        g = Graph()
+        for name in self.id_to_node:
+            g.add_node(name)
+        for u, edges in enumerate(self.adj):
+            for v, w in edges:
+                g.adj[v].append((u, w))
+        return g
+
+    def dijkstra(self, sources):
+        # sources: one node id or several (multi-source, e.g. every exit)
+        if isinstance(sources, int):
+            sources = [sources]
+        n = len(self.adj)
+        dist = [INF] * n
+        parent = [-1] * n
+        pq = []
+        for s in sources:
+            dist[s] = 0
+            pq.append((0, s))
+        heapq.heapify(pq)
+        while pq:
+            d, u = heapq.heappop(pq)
+            if d > dist[u]:
+                continue
+            for v, w in self.adj[u]:
+                nd = d + w
+                if nd < dist[v]:
+                    dist[v] = nd
+                    parent[v] = u
+                    heapq.heappush(pq, (nd, v))
+        return dist, parent
+
+    def reconstruct_path(self, target, parent):
+        path = []
+        at = target
+        while at != -1:
+            path.append(at)
+            at = parent[at]
+        path.reverse()
+        return path
+
+
+def default_layout(rows=ROWS, slots_per_row=SLOTS_PER_ROW):
+    # The 5 x 10 lot hardcoded in parking.cpp
+    return {
+        'entries': ['Entry'],
+        'exits': ['Exit'],
+        'rows': [{'name': r, 'slots': slots_per_row, 'head': ['Entry', i + 1], 'tail': ['Exit', i + 1],
+                  'links': [[1, 6], [5, 10]]} for i, r in enumerate(rows)],
+    }
+
+
+def generate_layout(levels=1, rows_per_level=5, slots_per_row=10, entries=1, exits=1):
+    # Synthetic multi-level lot: every entry reaches each level's ramp, each
+    # level has rows like the default lot, and every row end reaches every
+    # exit. Used by bench_layout.py.
+    entry_names = [f'Entry{i + 1}' if entries > 1 else 'Entry' for i in range(entries)]
+    exit_names = [f'Exit{i + 1}' if exits > 1 else 'Exit' for i in range(exits)]
+    row_names = [chr(ord('a') + i % 26) * (i // 26 + 1) for i in range(rows_per_level)]
+    layout = {'entries': entry_names, 'exits': exit_names, 'rows': [], 'edges': []}
+    for level in range(1, levels + 1):
+        prefix = f'L{level}' if levels > 1 else ''
+        ramp = f'{prefix or "L1"}ramp'
+        for e, entry in enumerate(entry_names):
+            layout['edges'].append([entry, ramp, 2 * level + e])
+        for i, r in enumerate(row_names):
+            links = [[1, slots_per_row // 2 + 1], [slots_per_row // 2, slots_per_row]] if slots_per_row > 2 else []
+            layout['rows'].append({'name': f'{prefix}{r}', 'slots': slots_per_row, 'head': [ramp, i + 1],
+                                   'links': links})
+            for x, exit_name in enumerate(exit_names):
+                layout['edges'].append([f'{prefix}{r}{slots_per_row}', exit_name, i + 1 + x + level])
+    return layout
+
+
+def build_graph(layout):
+    # Returns (graph, slot names in layout order)
+    g = Graph()
+    slots = []
+    for name in layout.get('entries', []) + layout.get('exits', []):
+        g.add_node(name)
+
+    for row in layout.get('rows', []):
+        name, count, step = row['name'], int(row['slots']), row.get('step', 1)
+        names = [f'{name}{i}' for i in range(1, count + 1)]
+        for slot in names:
+            g.add_node(slot)
+        slots += names
+        if 'head' in row:
+            g.add_edge(row['head'][0], names[0], row['head'][1])
+        for a, b in zip(names, names[1:]):
+            g.add_edge(a, b, step)
+        for a, b in row.get('links', []):
+            g.add_edge(names[a - 1], names[b - 1], 1)
+        if 'tail' in row:
+            g.add_edge(names[-1], row['tail'][0], row['tail'][1])
+
+    for src, dst, weight in layout.get('edges', []):
+        g.add_edge(src, dst, weight)
+    for slot in layout.get('slots', []):
+        g.add_node(slot)
+        slots.append(slot)
+    return g, slots
+
+
+class RouteTable:
+    def __init__(self, layout):
+        g, slots = build_graph(layout)
+        self.entries = list(layout.get('entries', []))
+        self.exits = list(layout.get('exits', []))
+        if not self.entries or not self.exits:
+            raise ValueError("Layout needs at least one entry and one exit")
+        if len(set(slots)) != len(slots):
+            raise ValueError("Layout has duplicate slot names")
+
+        self.nodes = g.id_to_node
+        self.slots = slots
+        self.slot_ids = array('i', (g.node_to_id[s] for s in slots))
+        self.slot_index = {s: i for i, s in enumerate(slots)}
+
+        # Per entry: cost of every slot and the shortest-path tree
+        self.costs = {}
+        self.entry_parent = {}
+        for entry in self.entries:
+            dist, parent = g.dijkstra(g.node_to_id[entry])
+            self.costs[entry] = array('d', (dist[n] for n in self.slot_ids))
+            self.entry_parent[entry] = array('i', parent)
+
+        # Towards the nearest exit: Dijkstra on the reversed graph from all
+        # exits at once; the parent of a node there is its next hop here
+        exit_dist, next_hop = g.reversed().dijkstra([g.node_to_id[x] for x in self.exits])
+        self.exit_cost = array('d', (exit_dist[n] for n in self.slot_ids))
+        self.next_hop = array('i', next_hop)
+
+        unreachable = [s for i, s in enumerate(slots)
+                       if self.exit_cost[i] == INF or all(self.costs[e][i] == INF for e in self.entries)]
+        if unreachable:
+            raise ValueError(f"Slots without a route from an entry to an exit: {unreachable[:10]}")
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, slot):
+        return slot in self.slot_index
+
+    def gate(self, gate=None):
+        # Resolves an entry name, defaulting to the first entry
+        if gate is None:
+            return self.entries[0]
+        if gate not in self.costs:
+            raise ValueError(f"Unknown entry gate: {gate}")
+        return gate
+
+    def cost(self, slot, gate=None):
+        return self.costs[self.gate(gate)][self.slot_index[slot]]
+
+    def ranked(self, gate=None):
+        # (cost, slot) for every slot reachable from the gate
+        costs = self.costs[self.gate(gate)]
+        return [(c, s) for c, s in zip(costs, self.slots) if c != INF]
+
+    def path(self, slot, gate=None):
+        # Entry -> slot -> nearest exit, as node names
+        i = self.slot_index.get(slot)
+        if i is None:
+            return []
+        node = self.slot_ids[i]
+        parent = self.entry_parent[self.gate(gate)]
+        walk = []
+        at = node
+        while at != -1:
+            walk.append(at)
+            at = parent[at]
+        walk.reverse()
+        at = self.next_hop[node]
+        while at != -1:
+            walk.append(at)
+            at = self.next_hop[at]
+        return [self.nodes[n] for n in walk]
+
+
+def load_layout(path=None):
+    # LOT_LAYOUT names a layout file; without one the parking.cpp lot is used
+    path = path or os.environ.get('LOT_LAYOUT')
+    if not path:
+        return default_layout()
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    # python lot_layout.py default|generate [levels rows_per_level slots_per_row entries exits]
+    if len(sys.argv) < 2 or sys.argv[1] not in ('default', 'generate'):
+        print("Usage: python lot_layout.py default|generate [levels rows_per_level slots_per_row entries exits]")
+        sys.exit(1)
+    if sys.argv[1] == 'default':
+        layout = default_layout()
+    else:
+        layout = generate_layout(*(int(a) for a in sys.argv[2:7]))
+    json.dump(layout, sys.stdout, indent=1)
+    print()
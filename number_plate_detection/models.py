@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+
+import cv2
+
+import plate_detector
+
+# Model loading for the Flask app. Two modes, chosen with MODEL_LOADING:
+#   preload (default) - load when app.py is imported. Under gunicorn with
+#                       preload_app (see gunicorn.conf.py) that happens once in
+#                       the master, and forked workers share the weights
+#                       copy-on-write instead of each holding a copy.
+#   lazy              - load on first use in each worker; fast boot, but the
+#                       first recognition request pays for the load.
+
+MODEL_LOADING = os.environ.get('MODEL_LOADING', 'preload').lower()
+CASCADE_FILE = os.environ.get('PLATE_CASCADE', 'haarcascade_russian_plate_number.xml')
+OCR_LANGS = ['en']
+
+_lock = threading.Lock()
+_cascade = None
+_reader = None
+_detector = None
+load_seconds = {}
+
+
+def get_plate_cascade():
+    global _cascade
+    if _cascade is None:
+        with _lock:
+            if _cascade is None:
+                start = time.perf_counter()
+                _cascade = cv2.CascadeClassifier(CASCADE_FILE)
+                load_seconds['cascade'] = time.perf_counter() - start
+    return _cascade
+
+
+def get_detector():
+    # Plate detector for /upload; backend and options from the environment
+    # (see plate_detector.py), the cascade keeps /upload's parameters
+    global _detector
+    if _detector is None:
+        cascade = get_plate_cascade() if plate_detector.detector_backend() == 'cascade' else None
+        with _lock:
+            if _detector is None:
+                start = time.perf_counter()
+                _detector = plate_detector.build_detector('upload', cascade, lane='upload')
+                load_seconds['detector'] = time.perf_counter() - start
+    return _detector
+
+
+def get_reader():
+    global _reader
+    if _reader is None:
+        with _lock:
+            if _reader is None:
+                import easyocr  # heavy (pulls in torch), so only imported when needed
+                start = time.perf_counter()
+                _reader = easyocr.Reader(OCR_LANGS)
+                load_seconds['easyocr'] = time.perf_counter() - start
+    return _reader
+
+
+def preload():
+    get_detector()
+    get_reader()
+
+
+def is_ready():
+    return _detector is not None and _reader is not None
+
+
+def status():
+    return {
+        'ready': is_ready(),
+        'mode': MODEL_LOADING,
+        'pid': os.getpid(),
+        'loaded': {'detector': _detector is not None, 'easyocr': _reader is not None},
+        'load_seconds': dict(load_seconds),
+    }
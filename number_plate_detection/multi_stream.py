@@ -0,0 +1,110 @@
+import logging
+import multiprocessing as mp
+import os
+import queue
+import time
+
+import cv2
+
+import event_log
+from image_store import images
+import metrics
+import number_plate
+
+# Runs one detection loop per gate from a single command:
+#   python number_plate.py --sources 0 rtsp://cam2/stream exit_gate.mp4 --headless
+# Each source gets its own process (so lanes spread across CPU cores and a
+# stuck camera cannot stall the others), its own LaneState (voting buffer and
+# dedup), and its own preview window unless --headless is given. Video files
+# are read to the end and then the lane finishes, which makes the mode easy
+# to run offline.
+#
+# Metrics live in each lane's process, so with --metrics-port PORT lane i
+# serves its own /metrics on PORT + i (scrape each lane as its own target).
+
+
+def lane_name(index, source):
+    if isinstance(source, int):
+        return f"cam{source}"
+    base = os.path.splitext(os.path.basename(source.rstrip("/")))[0]
+    return base or f"lane{index}"
+
+
+def stream_worker(index, source, mode, headless, core, results, reentry_seconds=None, metrics_port=None):
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+    # One lane per core: keep OpenCV from starting its own thread pool per process
+    cv2.setNumThreads(1)
+
+    source = number_plate.parse_source(source)
+    name = lane_name(index, source)
+    report = {"lane": name, "source": str(source)}
+    if metrics_port:
+        metrics.start_http_server(metrics_port + index)
+        report["metrics_port"] = metrics_port + index
+        logging.info(f"[{name}] Metrics on port {metrics_port + index}")
+
+    detector = number_plate.load_detector(name)
+    cap = number_plate.open_source(source)
+    if detector is None or not cap.isOpened():
+        report["error"] = "cannot open source" if detector is not None else "detector failed to load"
+        logging.error(f"[{name}] {report['error']}")
+        results.put(report)
+        return
+
+    lane = number_plate.LaneState(name)
+    if reentry_seconds is not None:
+        lane.dedup.reentry_seconds = reentry_seconds
+    start = time.perf_counter()
+    stats = number_plate.run_detection(cap, detector, mode, lane, window=name, headless=headless,
+                                       stop_at_end=number_plate.is_file_source(source))
+    elapsed = time.perf_counter() - start
+    cap.release()
+    # Child processes skip atexit, so write out queued log rows and images here
+    event_log.events.close()
+    images.close()
+
+    report.update({
+        "frames": stats.frames,
+        "processed": stats.frames - stats.skipped,
+        "skipped": stats.skipped,
+        "cascade": stats.detected,
+        "ocr": stats.ocr,
+        "logged": lane.count,
+        "plates": sorted(lane.dedup.plates()),
+        "seconds": round(elapsed, 3),
+        "fps": round(stats.frames / elapsed, 1) if elapsed else 0.0,
+    })
+    results.put(report)
+
+
+def run_streams(sources, mode="gated", headless=False, reentry_seconds=None, metrics_port=None):
+    cores = os.cpu_count() or 1
+    results = mp.Queue()
+    procs = []
+    for i, source in enumerate(sources):
+        proc = mp.Process(target=stream_worker, name=f"lane-{i}",
+                          args=(i, source, mode, headless, i % cores, results, reentry_seconds, metrics_port))
+        proc.start()
+        procs.append(proc)
+    logging.info(f"Started {len(procs)} lanes ({mode} mode) on {cores} cores")
+
+    reports = []
+    try:
+        # Drain results while waiting so no child blocks on a full queue
+        while len(reports) < len(procs):
+            try:
+                reports.append(results.get(timeout=0.5))
+            except queue.Empty:
+                if not any(p.is_alive() for p in procs):
+                    break
+    except KeyboardInterrupt:
+        logging.info("Stopping lanes...")
+        for proc in procs:
+            proc.terminate()
+    for proc in procs:
+        proc.join()
+
+    for report in reports:
+        logging.info(f"Lane summary: {report}")
+    return reports
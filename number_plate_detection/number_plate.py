@@ -1,18 +1,23 @@
 import cv2
 import os
-import pytesseract
 import re
 import numpy as np
 from datetime import datetime
 from save_data import save_vehicle_log
+from image_store import images
 import logging
-from collections import Counter
+import argparse
+import metrics
+from ocr_cache import OcrCache, dhash
+from plate_dedup import PlateDeduper, VoteRing
+from plate_detector import build_detector, detector_backend
+import tesseract_engine
 
 # Setup logging for console messages
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Tesseract OCR path (update if needed)
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Tesseract is loaded once per process (see tesseract_engine.py); set
+# TESSERACT_CMD / TESSERACT_LIB if it is not installed in the usual place
 
 cascade_file = "model/haarcascade_russian_plate_number.xml"
 valid_plate_regex = r'^[A-Z]{2}[0-9]{1,2}[A-Z]{1,2}[0-9]{3,4}$'
@@ -20,9 +25,56 @@ valid_plate_regex = r'^[A-Z]{2}[0-9]{1,2}[A-Z]{1,2}[0-9]{3,4}$'
 min_area = 500
 max_area = 15000
 buffer_size = 5
+reentry_window = 600         # seconds before the same plate is logged again
+max_tracked_plates = 4096    # cap on plates remembered for the re-entry window
 
-logged_plates = set()
-plate_text_buffer = []
+# Gated mode: skip frames without motion and follow a found plate with a
+# tracker, re-running the cascade only every redetect_interval frames
+motion_width = 160           # frames are downscaled to this width for the motion check
+motion_pixel_delta = 25      # grey-level change that counts a pixel as moving
+motion_min_fraction = 0.01   # fraction of moving pixels needed to process a frame
+redetect_interval = 15       # frames between cascade runs while tracking
+track_min_score = 0.6        # template-match score below which the track is lost
+track_margin = 0.5           # search window around the last box, as a fraction of its size
+stats_interval = 300         # frames between stats log lines
+
+# Consecutive frames of the same plate crop reuse the earlier OCR result;
+# exact hash matches unless OCR_CACHE_MAX_DISTANCE opts in to near ones
+ocr_cache = OcrCache('webcam', max_entries=256, ttl_seconds=60,
+                     max_distance=int(os.environ.get('OCR_CACHE_MAX_DISTANCE', 0)))
+
+class LaneState:
+    # Voting buffer and dedup state for one camera lane
+    def __init__(self, name=""):
+        self.name = name
+        self.votes = VoteRing(buffer_size)
+        self.dedup = PlateDeduper(reentry_window, max_tracked_plates)
+        self.count = 0
+
+    def vote(self, cleaned_text):
+        # Majority vote over the last buffer_size readings
+        return self.votes.add(cleaned_text)
+
+    def reset_vote(self):
+        self.votes.clear()
+
+    def settled(self, plate):
+        # True once the plate holds a real majority of the voting buffer
+        # (3 of 5), not just the most votes so far; until then a gated
+        # track keeps being read so the vote has readings to work with
+        return self.votes.count(plate) > self.votes.size // 2
+
+    def is_new(self, plate):
+        # False while the plate is inside its re-entry window
+        return not self.dedup.seen_recently(plate)
+
+    def mark_logged(self, plate):
+        self.dedup.mark(plate)
+        self.count += 1
+
+
+# State of the single webcam lane run by main()
+default_lane = LaneState()
 
 def preprocess_plate(img):
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -58,107 +110,330 @@ def clean_plate_text(text):
     else:
         return ""
 
-def save_plate_data(plate_text, img_roi, count):
-    # 1. Save entry in CSV using save_data.py function
-    save_vehicle_log(plate_text, slot="P12", gate="Entry", path="Straight → Left", status="IN")
+class MotionGate:
+    def __init__(self):
+        self.prev = None
+
+    def has_motion(self, gray):
+        scale = motion_width / gray.shape[1]
+        small = cv2.resize(gray, (motion_width, max(1, int(gray.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        prev, self.prev = self.prev, small
+        if prev is None:
+            return True
+        moving = cv2.countNonZero(cv2.threshold(cv2.absdiff(prev, small), motion_pixel_delta,
+                                                255, cv2.THRESH_BINARY)[1])
+        return moving >= motion_min_fraction * small.size
+
+
+class PlateTracker:
+    # Template-matching tracker: looks for the last plate patch in a window
+    # around its previous position. Only needs core OpenCV.
+    def __init__(self):
+        self.box = None
+        self.template = None
+
+    def start(self, gray, box):
+        x, y, w, h = box
+        self.box = (x, y, w, h)
+        self.template = gray[y:y+h, x:x+w].copy()
+
+    def stop(self):
+        self.box = None
+        self.template = None
+
+    def update(self, gray):
+        if self.box is None:
+            return None
+        x, y, w, h = self.box
+        mx, my = int(w * track_margin), int(h * track_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(gray.shape[1], x + w + mx), min(gray.shape[0], y + h + my)
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < h or window.shape[1] < w:
+            self.stop()
+            return None
+        scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (bx, by) = cv2.minMaxLoc(scores)
+        if score < track_min_score:
+            self.stop()
+            return None
+        self.start(gray, (x0 + bx, y0 + by, w, h))
+        return self.box
+
+
+class FrameStats:
+    def __init__(self):
+        self.frames = 0
+        self.skipped = 0       # no motion, nothing run
+        self.tracked = 0       # plate followed by the tracker, no cascade
+        self.detected = 0      # cascade run
+        self.ocr = 0           # OCR run
+
+    def summary(self):
+        processed = self.frames - self.skipped
+        return (f"Frames: {self.frames}, processed: {processed}, skipped: {self.skipped}, "
+                f"tracked: {self.tracked}, cascade: {self.detected}, ocr: {self.ocr}")
+
+
+def detect_largest_plate(detector, gray):
+    plates = detector.detect(gray)
+    if len(plates) == 0:
+        return None
+    x, y, w, h = plates[0]
+    if not (min_area < w * h < max_area):
+        return None
+    if h < 20 or w < 20:
+        return None
+    return (x, y, w, h)
+
+
+class PlateLocator:
+    # Finds the plate box for each frame. In gated mode a found plate is
+    # tracked between periodic cascade runs, and static frames are skipped
+    # once the current track's plate vote has settled (resolve()) or when
+    # there is no track; a car that stops before its plate was read keeps
+    # being located and read. track_id changes whenever a new track starts.
+    def __init__(self, detector, gated=True):
+        self.detector = detector
+        self.gated = gated
+        self.motion = MotionGate()
+        self.tracker = PlateTracker()
+        self.stats = FrameStats()
+        self.since_detect = 0
+        self.track_id = 0
+        self.resolved_track = None
+        self.skipped = False
+
+    @property
+    def resolved(self):
+        return self.resolved_track == self.track_id
+
+    def resolve(self, track_id=None):
+        # A plate was accepted for this track (default: the current one)
+        self.resolved_track = self.track_id if track_id is None else track_id
+
+    def locate(self, gray):
+        self.stats.frames += 1
+        static = self.gated and not self.motion.has_motion(gray)
+        self.skipped = static and (self.tracker.box is None or self.resolved)
+        if self.skipped:
+            # Static scene with nothing left to read
+            self.stats.skipped += 1
+            return self.tracker.box
+
+        box = None
+        tracking = self.tracker.box is not None
+        if self.gated and tracking and self.since_detect < redetect_interval:
+            box = self.tracker.update(gray)
+            if box is not None:
+                self.stats.tracked += 1
+                self.since_detect += 1
+                return box
+            tracking = False
+
+        self.stats.detected += 1
+        self.since_detect = 0
+        with metrics.stage('detect'):
+            box = detect_largest_plate(self.detector, gray)
+        if box is None:
+            self.tracker.stop()
+            return None
+        if not tracking:
+            self.track_id += 1
+        if self.gated:
+            self.tracker.start(gray, box)
+        return box
+
+
+def read_plate(img_roi):
+    processed_roi = preprocess_plate(img_roi)
+    raw_text = tesseract_engine.image_to_string(processed_roi).strip()
+    return clean_plate_text(raw_text)
+
+
+def cached_read_plate(img_roi):
+    # read_plate through the perceptual-hash cache; only valid plates are cached
+    key = dhash(img_roi)
+    text = ocr_cache.get(key)
+    if text is None:
+        with metrics.stage('ocr'):
+            text = read_plate(img_roi)
+        if text:
+            ocr_cache.put(key, text)
+    return text
 
-    # 2. Save detected plate image in plates/plate_img folder
-    save_path = f"plates/plate_img/detected_{plate_text}_{count}.jpg"
-    cv2.imwrite(save_path, img_roi)
+
+def save_plate_data(plate_text, img_roi, count, lane_name=""):
+    # 1. Save entry in the event log using save_data.py function (written in
+    # the background; the webcam does not allocate a slot)
+    save_vehicle_log(plate_text, gate=lane_name or "Entry", status="IN", source="webcam")
+
+    # 2. Queue the plate crop for the image store (see image_store.py)
+    images.save(img_roi.copy(), plate_text, source=f"webcam:{lane_name}" if lane_name else "webcam")
 
     # 3. Logging info
-    logging.info(f"Saved vehicle entry: {plate_text} to CSV")
-    logging.info(f"Saved plate image at: {save_path}")
+    logging.info(f"Saved vehicle entry #{count}: {plate_text} to event log and image store")
 
-def main():
-    # Create directories if not exist
-    os.makedirs("plates/plate_img", exist_ok=True)
-    os.makedirs("model", exist_ok=True)
+def show_frame(frame, window="Result", headless=False):
+    # Returns True when the user pressed 'q'
+    if headless:
+        return False
+    cv2.imshow(window, frame)
+    return cv2.waitKey(1) & 0xFF == ord('q')
 
-    plate_cascade = cv2.CascadeClassifier(cascade_file)
-    if plate_cascade.empty():
-        logging.error("Cascade file missing or failed to load!")
-        return
+def load_detector(lane_name=None):
+    # Cascade by default; PLATE_DETECTOR, PLATE_SEARCH_WIDTH and PLATE_ROI
+    # switch backend and options (see plate_detector.py)
+    cascade = cv2.CascadeClassifier(cascade_file) if detector_backend() == 'cascade' else None
+    try:
+        return build_detector('webcam', cascade, lane=lane_name)
+    except (ValueError, cv2.error) as e:
+        logging.error(f"Plate detector failed to load: {e}")
+        return None
 
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
-    cap.set(cv2.CAP_PROP_FOCUS, 30)
+def parse_source(source):
+    # Camera index ("0"), RTSP/HTTP URL or video file path
+    if isinstance(source, int):
+        return source
+    return int(source) if source.isdigit() else source
 
-    if not cap.isOpened():
-        logging.error("Cannot open webcam")
-        return
+def open_source(source):
+    cap = cv2.VideoCapture(source)
+    if isinstance(source, int):
+        cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
+        cap.set(cv2.CAP_PROP_FOCUS, 30)
+    return cap
 
-    count = 0
-    logging.info("Starting detection, press 'q' to quit")
+def is_file_source(source):
+    return isinstance(source, str) and os.path.isfile(source)
+
+def run_detection(cap, detector, mode="gated", lane=None, window="Result",
+                  headless=False, stop_at_end=False):
+    # Single-threaded detection loop for one source. Returns the frame stats.
+    lane = lane or default_lane
+    gated = mode == "gated"
+    locator = PlateLocator(detector, gated)
+    stats = locator.stats
+    label = f"[{lane.name}] " if lane.name else ""
 
     while True:
         ret, frame = cap.read()
         if not ret:
-            logging.warning("Failed to read frame from webcam")
+            if stop_at_end:
+                break
+            logging.warning(f"{label}Failed to read frame from source")
             continue
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        plates = plate_cascade.detectMultiScale(gray, 1.1, 3, minSize=(60, 20))
+        if (stats.frames + 1) % stats_interval == 0:
+            logging.info(label + stats.summary())
 
-        if len(plates) == 0:
-            cv2.imshow("Result", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-            continue
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        box = locator.locate(gray)
 
-        plates = sorted(plates, key=lambda b: b[2]*b[3], reverse=True)
-        x, y, w, h = plates[0]
-        area = w * h
-        if not (min_area < area < max_area):
-            cv2.imshow("Result", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+        if box is None:
+            if show_frame(frame, window, headless):
                 break
             continue
 
+        x, y, w, h = box
         img_roi = frame[y:y+h, x:x+w]
-        if img_roi.shape[0] < 20 or img_roi.shape[1] < 20:
-            cv2.imshow("Result", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-            continue
 
-        processed_roi = preprocess_plate(img_roi)
-        config = r'--oem 3 --psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-        raw_text = pytesseract.image_to_string(processed_roi, config=config).strip()
-        cleaned_text = clean_plate_text(raw_text)
+        if not locator.skipped and not locator.resolved:
+            stats.ocr += 1
+            cleaned_text = cached_read_plate(img_roi)
 
-        if cleaned_text:
-            plate_text_buffer.append(cleaned_text)
-            if len(plate_text_buffer) > buffer_size:
-                plate_text_buffer.pop(0)
+            if cleaned_text:
+                final_plate = lane.vote(cleaned_text)
 
-            final_plate = Counter(plate_text_buffer).most_common(1)[0][0]
+                if lane.is_new(final_plate):
+                    logging.info(f"{label}Detected Plate: {final_plate}")
 
-            if final_plate not in logged_plates:
-                logging.info(f"Detected Plate: {final_plate}")
+                    # Save image and log to CSV
+                    save_plate_data(final_plate, img_roi, lane.count, lane.name)
+                    lane.mark_logged(final_plate)
 
-                # Save image and log to CSV
-                save_plate_data(final_plate, img_roi, count)
-                logged_plates.add(final_plate)
-                count += 1
+                    # Show detected plate text on frame
+                    if not headless:
+                        cv2.putText(frame, final_plate, (x, y-30), cv2.FONT_HERSHEY_COMPLEX, 1, (0,255,0), 2)
 
-                # Show detected plate text on frame
-                cv2.putText(frame, final_plate, (x, y-30), cv2.FONT_HERSHEY_COMPLEX, 1, (0,255,0), 2)
+                # Stop re-reading a tracked plate once the vote has settled
+                if gated and lane.settled(final_plate):
+                    locator.resolve()
 
-        else:
-            plate_text_buffer.clear()
+            else:
+                lane.reset_vote()
 
-        cv2.rectangle(frame, (x,y), (x+w,y+h), (0,255,0), 2)
-        cv2.putText(frame, "Number Plate", (x, y-5), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, (255,0,255), 2)
+        if not headless:
+            cv2.rectangle(frame, (x,y), (x+w,y+h), (0,255,0), 2)
+            cv2.putText(frame, "Number Plate", (x, y-5), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, (255,0,255), 2)
 
-        cv2.imshow("Result", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            logging.info("Exiting...")
+        if show_frame(frame, window, headless):
+            logging.info(f"{label}Exiting...")
             break
 
+    logging.info(label + stats.summary())
+    logging.info(f"{label}OCR cache: {ocr_cache.stats()}")
+    return stats
+
+def main(mode="gated", ocr_workers=2):
+    # Create directories if not exist
+    os.makedirs("model", exist_ok=True)
+
+    detector = load_detector(default_lane.name)
+    if detector is None:
+        return
+
+    cap = open_source(0)
+    if not cap.isOpened():
+        logging.error("Cannot open webcam")
+        return
+
+    logging.info(f"Starting detection ({mode} mode), press 'q' to quit")
+    if mode == "pipelined":
+        from pipeline import run_pipeline
+        run_pipeline(cap, detector, gated=True, ocr_workers=ocr_workers)
+    else:
+        run_detection(cap, detector, mode)
+
     cap.release()
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
-         
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Webcam number plate detection")
+    parser.add_argument("--mode", choices=["gated", "full", "pipelined"], default="gated",
+                        help="gated: skip static frames and track plates; full: cascade + OCR on every frame; "
+                             "pipelined: gated, with capture/detect/OCR/persist in separate stages")
+    parser.add_argument("--ocr-workers", type=int, default=2, help="OCR processes in pipelined mode")
+    parser.add_argument("--sources", nargs="+", metavar="SOURCE",
+                        help="run several lanes at once: camera indices, RTSP URLs or video files")
+    parser.add_argument("--headless", action="store_true", help="no preview windows (multi-source mode)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this port (with --sources, lane i uses port + i)")
+    parser.add_argument("--reentry-window", type=float, default=reentry_window,
+                        help="seconds before the same plate is logged again")
+    parser.add_argument("--detector", choices=["cascade", "dnn"], help="plate detector backend (PLATE_DETECTOR)")
+    parser.add_argument("--dnn-model", help="ONNX plate model for --detector dnn (PLATE_DNN_MODEL)")
+    parser.add_argument("--search-width", type=int,
+                        help="detect on a copy downscaled to this width, then refine (PLATE_SEARCH_WIDTH)")
+    parser.add_argument("--roi", help='static search region, "x0,y0,x1,y1" fractions or a mask image; '
+                                      '"lane=spec;lane2=spec" per lane (PLATE_ROI)')
+    args = parser.parse_args()
+    if args.sources and args.mode == "pipelined":
+        parser.error("--mode pipelined runs a single source; use gated or full with --sources")
+    # Passed on through the environment so lane processes pick them up too
+    for env, value in (("PLATE_DETECTOR", args.detector), ("PLATE_DNN_MODEL", args.dnn_model),
+                       ("PLATE_SEARCH_WIDTH", args.search_width), ("PLATE_ROI", args.roi)):
+        if value is not None:
+            os.environ[env] = str(value)
+    reentry_window = args.reentry_window
+    default_lane.dedup.reentry_seconds = reentry_window
+    if args.sources:
+        from multi_stream import run_streams
+        run_streams(args.sources, mode=args.mode, headless=args.headless,
+                    reentry_seconds=reentry_window, metrics_port=args.metrics_port)
+    else:
+        if args.metrics_port:
+            metrics.start_http_server(args.metrics_port)
+        main(args.mode, args.ocr_workers)
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Occupancy is kept in SQLite (WAL mode) instead of slots.txt so that several
+# gunicorn workers can allocate and free slots without rewriting a text file or
+# racing each other. Every allocate/free is a single IMMEDIATE transaction, and
+# plate and slot lookups go through indexes rather than a file scan.
+
+DB_FILE = 'occupancy.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS occupancy (
+    slot TEXT PRIMARY KEY,
+    plate TEXT NOT NULL,
+    plate_key TEXT NOT NULL UNIQUE,
+    allocated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plate TEXT NOT NULL,
+    plate_key TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    event TEXT NOT NULL,
+    at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_plate_idx ON history (plate_key, at);
+CREATE INDEX IF NOT EXISTS history_slot_idx ON history (slot, at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def normalize_plate(plate):
+    # Same normalisation log_exit_locally applied before matching slots.txt
+    return plate.upper().replace(" ", "").replace("]", "")
+
+
+def now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class OccupancyStore:
+    def __init__(self, db_path=DB_FILE):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self._conn = None
+        self._pid = None
+
+    def conn(self):
+        # One connection per process; a connection inherited across a fork
+        # (gunicorn preload) must not be reused by the child.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                   check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can
+        # never both see a slot as free and hand it out.
+        with self.lock:
+            conn = self.conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                # A failed COMMIT (busy, disk error) can leave the
+                # transaction open on this process's only connection
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def data_version(self):
+        # Changes whenever another connection (another worker) commits
+        with self.lock:
+            return self.conn().execute("PRAGMA data_version").fetchone()[0]
+
+    def slot_for_plate(self, plate, conn=None):
+        with self.lock:
+            row = (conn or self.conn()).execute(
+                "SELECT slot FROM occupancy WHERE plate_key = ?",
+                (normalize_plate(plate),)).fetchone()
+        return row[0] if row else None
+
+    def plate_for_slot(self, slot, conn=None):
+        with self.lock:
+            row = (conn or self.conn()).execute(
+                "SELECT plate FROM occupancy WHERE slot = ?", (slot,)).fetchone()
+        return row[0] if row else None
+
+    def occupied(self, conn=None):
+        with self.lock:
+            rows = (conn or self.conn()).execute("SELECT slot, plate FROM occupancy").fetchall()
+        return dict(rows)
+
+    def allocations(self, conn=None):
+        # [(slot, plate, allocated_at)] for every occupied slot
+        with self.lock:
+            return (conn or self.conn()).execute(
+                "SELECT slot, plate, allocated_at FROM occupancy").fetchall()
+
+    def insert(self, conn, plate, slot):
+        # Must be called inside transaction(); returns False if the slot or
+        # plate was taken by someone else in the meantime.
+        at = now()
+        try:
+            conn.execute("INSERT INTO occupancy (slot, plate, plate_key, allocated_at) VALUES (?, ?, ?, ?)",
+                         (slot, plate, normalize_plate(plate), at))
+        except sqlite3.IntegrityError:
+            return False
+        conn.execute("INSERT INTO history (plate, plate_key, slot, event, at) VALUES (?, ?, ?, 'allocate', ?)",
+                     (plate, normalize_plate(plate), slot, at))
+        return True
+
+    def _delete(self, conn, row):
+        if row is None:
+            return None
+        slot, plate = row
+        conn.execute("DELETE FROM occupancy WHERE slot = ?", (slot,))
+        conn.execute("INSERT INTO history (plate, plate_key, slot, event, at) VALUES (?, ?, ?, 'free', ?)",
+                     (plate, normalize_plate(plate), slot, now()))
+        return slot, plate
+
+    def free_plate(self, plate):
+        # Returns (slot, stored plate), or None if the plate is not parked
+        with self.transaction() as conn:
+            row = conn.execute("SELECT slot, plate FROM occupancy WHERE plate_key = ?",
+                               (normalize_plate(plate),)).fetchone()
+            return self._delete(conn, row)
+
+    def free_slot(self, slot):
+        # Returns the plate that was parked there, or None
+        with self.transaction() as conn:
+            row = conn.execute("SELECT slot, plate FROM occupancy WHERE slot = ?", (slot,)).fetchone()
+            freed = self._delete(conn, row)
+        return freed[1] if freed else None
+
+    def free_latest(self):
+        # Frees the most recently allocated car; returns (plate, slot) or None
+        with self.transaction() as conn:
+            row = conn.execute("SELECT slot, plate FROM occupancy "
+                               "ORDER BY allocated_at DESC, rowid DESC LIMIT 1").fetchone()
+            freed = self._delete(conn, row)
+        return (freed[1], freed[0]) if freed else None
+
+    def import_slots_txt(self, filename, force=False):
+        # One-time import of the legacy "<plate> <slot>" file. Returns the
+        # number of rows imported, or None if it had already been imported.
+        with self.transaction() as conn:
+            done = conn.execute("SELECT value FROM meta WHERE key = 'slots_txt_imported'").fetchone()
+            if done and not force:
+                return None
+            imported = 0
+            if os.path.exists(filename):
+                with open(filename, 'r') as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) == 2 and self.insert(conn, parts[0], parts[1]):
+                            imported += 1
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('slots_txt_imported', ?)", (now(),))
+        return imported
+
+
+if __name__ == '__main__':
+    # python occupancy_store.py import [slots.txt] [occupancy.db]
+    if len(sys.argv) < 2 or sys.argv[1] != 'import':
+        print("Usage: python occupancy_store.py import [slots.txt] [occupancy.db]")
+        sys.exit(1)
+    source = sys.argv[2] if len(sys.argv) > 2 else 'slots.txt'
+    store = OccupancyStore(sys.argv[3] if len(sys.argv) > 3 else DB_FILE)
+    count = store.import_slots_txt(source, force=True)
+    print(f"Imported {count} allocations from {source}")
@@ -0,0 +1,93 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Micro-batching front end for a shared easyocr.Reader. Request threads submit
+# an image and block on their own Future; a single worker thread collects
+# whatever arrives within max_wait_ms (up to max_batch_size images) and runs
+# it through the model together. Images are grouped by shape because
+# readtext_batched needs equally sized inputs. The reader is passed as a
+# zero-argument callable so it can be loaded lazily (see models.py).
+
+
+class BatchedReader:
+    def __init__(self, get_reader, max_batch_size=8, max_wait_ms=5.0):
+        self.get_reader = get_reader
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        # Started on first use (and again after a fork) since threads do not
+        # survive into forked gunicorn workers.
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.queue = queue.Queue()
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name='ocr-batcher', daemon=True)
+                self.thread.start()
+
+    def submit(self, image):
+        self._ensure_worker()
+        future = Future()
+        self.queue.put((image, future))
+        return future
+
+    def readtext(self, image, timeout=None):
+        # Drop-in replacement for reader.readtext(image)
+        return self.submit(image).result(timeout)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': (self.items / self.batches) if self.batches else 0.0,
+        }
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for image, future in batch:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault((image.shape, image.dtype.str), []).append((image, future))
+
+            for items in groups.values():
+                images = [image for image, _ in items]
+                try:
+                    reader = self.get_reader()
+                    if len(images) == 1:
+                        results = [reader.readtext(images[0])]
+                    else:
+                        results = reader.readtext_batched(images, batch_size=len(images))
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(items, results):
+                    future.set_result(result)
+
+            self.batches += 1
+            self.items += len(batch)
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+import metrics
+
+# Bounded LRU + TTL cache of OCR results keyed by a perceptual hash (dHash)
+# of the plate crop. Only detector plate crops should be hashed: a whole
+# frame from a fixed camera is mostly background, so two different cars can
+# hash alike.
+#
+# By default only an exact hash match is a hit (max_distance=0). Near matching
+# (anything within max_distance bits) is opt-in and has a thin margin: on the
+# plates/plate_img corpus separate captures of the same plate are up to 3 bits
+# apart, while crops OCR reads as different plates can be only 4 bits apart.
+# Never serve cached reads where a wrong plate has consequences (exits).
+#
+# Near lookups avoid scanning every entry: the 64-bit hash is split into
+# max_distance + 1 bands and each band is indexed separately. Two hashes within
+# max_distance bits must agree exactly on at least one band (pigeonhole), so
+# only entries sharing a band are compared.
+
+HASH_BITS = 64
+
+lookups = metrics.registry.register(metrics.Counter(
+    'ocr_cache_lookups_total', 'OCR cache lookups by result (hit, near_hit, miss)', ('cache', 'result')))
+hit_ratio = metrics.registry.register(metrics.Gauge(
+    'ocr_cache_hit_ratio', 'Share of OCR cache lookups served from the cache', ('cache',)))
+cache_entries = metrics.registry.register(metrics.Gauge(
+    'ocr_cache_entries', 'Entries currently held by the OCR cache', ('cache',)))
+
+
+def dhash(image):
+    # 64-bit difference hash of a BGR or greyscale crop
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class OcrCache:
+    def __init__(self, name='ocr', max_entries=1024, ttl_seconds=300.0, max_distance=0):
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.max_distance = max(0, int(max_distance))
+        self.entries = OrderedDict()  # hash -> (value, expires_at), oldest first
+        self.lock = threading.Lock()
+
+        self.band_count = self.max_distance + 1
+        self.band_bits = -(-HASH_BITS // self.band_count)
+        self.band_mask = (1 << self.band_bits) - 1
+        self.bands = [dict() for _ in range(self.band_count)]
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        metrics.registry.on_render(self.publish)
+
+    def _band_keys(self, h):
+        return [(h >> (i * self.band_bits)) & self.band_mask for i in range(self.band_count)]
+
+    def _unlink(self, h):
+        self.entries.pop(h, None)
+        for band, key in zip(self.bands, self._band_keys(h)):
+            bucket = band.get(key)
+            if bucket is not None:
+                bucket.discard(h)
+                if not bucket:
+                    del band[key]
+
+    def _live(self, h, now):
+        entry = self.entries.get(h)
+        if entry is None:
+            return None
+        if entry[1] < now:
+            self._unlink(h)
+            self.expirations += 1
+            return None
+        return entry
+
+    def get(self, h):
+        now = time.monotonic()
+        with self.lock:
+            entry = self._live(h, now)
+            result = 'hit'
+            if entry is None and self.max_distance:
+                best = None
+                for band, key in zip(self.bands, self._band_keys(h)):
+                    for candidate in band.get(key, ()):
+                        d = hamming(h, candidate)
+                        if d <= self.max_distance and (best is None or d < best[0]):
+                            best = (d, candidate)
+                if best is not None:
+                    entry = self._live(best[1], now)
+                    h = best[1]
+                    result = 'near_hit'
+            if entry is None:
+                self.misses += 1
+                lookups.inc(cache=self.name, result='miss')
+                return None
+            self.entries.move_to_end(h)
+            if result == 'hit':
+                self.hits += 1
+            else:
+                self.near_hits += 1
+        lookups.inc(cache=self.name, result=result)
+        return entry[0]
+
+    def put(self, h, value):
+        with self.lock:
+            if h in self.entries:
+                self._unlink(h)
+            self.entries[h] = (value, time.monotonic() + self.ttl)
+            for band, key in zip(self.bands, self._band_keys(h)):
+                band.setdefault(key, set()).add(h)
+            while len(self.entries) > self.max_entries:
+                oldest = next(iter(self.entries))
+                self._unlink(oldest)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.near_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.near_hits) / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def publish(self):
+        stats = self.stats()
+        hit_ratio.set(stats['hit_rate'], cache=self.name)
+        cache_entries.set(stats['entries'], cache=self.name)
@@ -0,0 +1,240 @@
+import collections
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+import metrics
+import number_plate
+
+# Staged version of the webcam loop in number_plate.py:
+#
+#   capture thread -> frames -> detect stage -> crops -> OCR (process pool)
+#                                                           -> results -> persist stage
+#
+# Every hand-off is a bounded DropOldestQueue, so a slow stage sheds its oldest
+# backlog instead of stalling the stages in front of it; throughput is set by
+# the slowest stage rather than by the sum of all of them. Each stage keeps
+# queue depth, drop, wait and processing-time counters that are logged every
+# stats_seconds.
+
+frame_queue_size = 2
+crop_queue_size = 4
+result_queue_size = 32
+stats_seconds = 10
+
+
+class DropOldestQueue:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = collections.deque()
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.high_water = 0
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append((time.perf_counter(), item))
+            self.high_water = max(self.high_water, len(self.items))
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        # Returns (enqueued_at, item), or None on timeout
+        with self.cond:
+            if not self.items and not self.cond.wait_for(lambda: self.items, timeout):
+                return None
+            return self.items.popleft()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class StageStats:
+    def __init__(self, name, inbox=None):
+        self.name = name
+        self.inbox = inbox
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.busy = 0.0
+        self.wait = 0.0
+        self.max_latency = 0.0
+
+    def record(self, wait, latency):
+        with self.lock:
+            self.processed += 1
+            self.wait += wait
+            self.busy += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def summary(self):
+        with self.lock:
+            n = self.processed or 1
+            text = (f"{self.name}: n={self.processed} avg={self.busy / n * 1000:.1f}ms "
+                    f"max={self.max_latency * 1000:.1f}ms wait={self.wait / n * 1000:.1f}ms")
+        if self.inbox is not None:
+            text += f" depth={len(self.inbox)}/{self.inbox.maxsize} dropped={self.inbox.dropped}"
+        return text
+
+
+class Stage(threading.Thread):
+    # Pulls items from inbox and runs func on each until stop is set
+    def __init__(self, name, func, inbox, stop):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.stop = stop
+        self.stats = StageStats(name, inbox)
+
+    def run(self):
+        while not self.stop.is_set():
+            got = self.inbox.get(timeout=0.1)
+            if got is None:
+                continue
+            enqueued_at, item = got
+            start = time.perf_counter()
+            try:
+                self.func(item)
+            except Exception:
+                logging.exception(f"{self.name} stage failed")
+            self.stats.record(start - enqueued_at, time.perf_counter() - start)
+
+
+class PlatePipeline:
+    def __init__(self, cap, detector, gated=True, ocr_workers=2, lane=None):
+        self.cap = cap
+        self.gated = gated
+        self.lane = lane or number_plate.default_lane
+        self.locator = number_plate.PlateLocator(detector, gated)
+        self.stop = threading.Event()
+        self.frames = DropOldestQueue(frame_queue_size)
+        self.crops = DropOldestQueue(crop_queue_size)
+        self.results = DropOldestQueue(result_queue_size)
+        self.pool = ProcessPoolExecutor(max_workers=ocr_workers)
+        self.ocr_slots = threading.Semaphore(ocr_workers)
+        self.ocr_stats = StageStats('ocr', self.crops)
+        self.capture_stats = StageStats('capture')
+        self.latest = None  # (frame, box) for display
+        self.stages = [
+            Stage('detect', self.detect, self.frames, self.stop),
+            Stage('ocr-submit', self.submit_ocr, self.crops, self.stop),
+            Stage('persist', self.persist, self.results, self.stop),
+        ]
+        self.capture_thread = threading.Thread(target=self.capture, name='capture', daemon=True)
+
+    def capture(self):
+        while not self.stop.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                logging.warning("Failed to read frame from source")
+                time.sleep(0.01)
+                continue
+            self.capture_stats.record(0.0, time.perf_counter() - start)
+            self.frames.put(frame)
+
+    def detect(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        box = self.locator.locate(gray)
+        self.latest = (frame, box)
+        if box is None or self.locator.skipped:
+            return
+        if self.locator.resolved:
+            return
+        track_id = self.locator.track_id
+        x, y, w, h = box
+        self.crops.put((frame[y:y+h, x:x+w].copy(), track_id))
+
+    def submit_ocr(self, item):
+        # Blocks while every OCR worker is busy, so crops back up (and the
+        # oldest are dropped) in self.crops rather than piling into the pool
+        img_roi, track_id = item
+        key = number_plate.dhash(img_roi)
+        cached = number_plate.ocr_cache.get(key)
+        if cached is not None:
+            self.results.put((cached, img_roi, track_id))
+            return
+        while not self.ocr_slots.acquire(timeout=0.1):
+            if self.stop.is_set():
+                return
+        submitted = time.perf_counter()
+        future = self.pool.submit(number_plate.read_plate, img_roi)
+        self.locator.stats.ocr += 1
+
+        def done(f):
+            self.ocr_slots.release()
+            if f.cancelled():
+                return
+            latency = time.perf_counter() - submitted
+            self.ocr_stats.record(0.0, latency)
+            metrics.stage_seconds.observe(latency, stage='ocr')
+            try:
+                text = f.result()
+            except Exception:
+                logging.exception("OCR failed")
+                return
+            if text:
+                number_plate.ocr_cache.put(key, text)
+            self.results.put((text, img_roi, track_id))
+
+        future.add_done_callback(done)
+
+    def persist(self, item):
+        cleaned_text, img_roi, track_id = item
+        if not cleaned_text:
+            self.lane.reset_vote()
+            return
+        final_plate = self.lane.vote(cleaned_text)
+        if self.lane.is_new(final_plate):
+            logging.info(f"Detected Plate: {final_plate}")
+            number_plate.save_plate_data(final_plate, img_roi, self.lane.count, self.lane.name)
+            self.lane.mark_logged(final_plate)
+        if self.gated and self.lane.settled(final_plate):
+            self.locator.resolve(track_id)
+
+    def stats_summary(self):
+        detect, _, persist = self.stages
+        parts = [self.capture_stats, detect.stats, self.ocr_stats, persist.stats]
+        return " | ".join([s.summary() for s in parts] + [self.locator.stats.summary()])
+
+    def start(self):
+        self.capture_thread.start()
+        for stage in self.stages:
+            stage.start()
+
+    def close(self):
+        self.stop.set()
+        self.capture_thread.join(timeout=2)
+        for stage in self.stages:
+            stage.join(timeout=2)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pipeline(cap, detector, gated=True, ocr_workers=2, lane=None):
+    pipeline = PlatePipeline(cap, detector, gated, ocr_workers, lane)
+    pipeline.start()
+    logging.info("Pipeline started, press 'q' to quit")
+    last_stats = time.monotonic()
+    try:
+        while True:
+            if pipeline.latest is not None:
+                frame, box = pipeline.latest
+                frame = frame.copy()
+                if box is not None:
+                    x, y, w, h = box
+                    cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                if number_plate.show_frame(frame):
+                    logging.info("Exiting...")
+                    break
+            else:
+                time.sleep(0.01)
+            if time.monotonic() - last_stats >= stats_seconds:
+                logging.info(pipeline.stats_summary())
+                last_stats = time.monotonic()
+    finally:
+        pipeline.close()
+        logging.info(pipeline.stats_summary())
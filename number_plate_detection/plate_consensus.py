@@ -0,0 +1,59 @@
+import re
+
+# Per-character voting over several OCR readings of the same plate, for
+# /upload/burst. The webcam loop's VoteRing votes on whole strings, so one
+# misread character costs the whole reading; here each position is voted on
+# separately, weighted by the OCR confidence of the reading, and two partly
+# wrong readings can still combine into the right plate.
+#
+# Readings only vote against readings of the same length (characters cannot
+# be aligned otherwise), and the length with the most weight wins.
+# Confidence of the consensus is the weakest position's:
+#
+#   share     - weight of the winning character / weight of all readings of
+#               that length at that position (1.0 if everyone agrees)
+#   evidence  - 1 - prod(1 - p) over the readings that agree, so agreement
+#               between independent readings adds up
+#
+# times the winning length's share of all weight. A single reading therefore
+# scores its own OCR confidence, and a second agreeing one raises it.
+
+
+def normalize(text):
+    return re.sub(r'[^A-Z0-9]', '', text.upper())
+
+
+class PlateConsensus:
+    def __init__(self):
+        # length -> [{char: [weight, miss product]}, ...] per position
+        self.positions = {}
+        self.length_weight = {}
+        self.total_weight = 0.0
+        self.readings = 0
+
+    def add(self, text, confidence=1.0):
+        text = normalize(text)
+        if not text:
+            return
+        p = min(max(float(confidence), 0.0), 0.999)
+        slots = self.positions.setdefault(len(text), [{} for _ in text])
+        for votes, ch in zip(slots, text):
+            weight, miss = votes.get(ch, (0.0, 1.0))
+            votes[ch] = (weight + p, miss * (1.0 - p))
+        self.length_weight[len(text)] = self.length_weight.get(len(text), 0.0) + p
+        self.total_weight += p
+        self.readings += 1
+
+    def result(self):
+        # (plate, confidence); ("", 0.0) before any reading
+        if not self.total_weight:
+            return "", 0.0
+        length = max(self.length_weight, key=self.length_weight.get)
+        length_weight = self.length_weight[length]
+        plate = []
+        confidence = 1.0
+        for votes in self.positions[length]:
+            ch, (weight, miss) = max(votes.items(), key=lambda item: item[1][0])
+            plate.append(ch)
+            confidence = min(confidence, weight / length_weight * (1.0 - miss))
+        return ''.join(plate), confidence * length_weight / self.total_weight
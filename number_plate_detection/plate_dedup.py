@@ -0,0 +1,96 @@
+import time
+from collections import OrderedDict
+
+# Per-lane state for the webcam loop that used to grow without bound:
+#   PlateDeduper - "was this plate logged within the re-entry window?" Entries
+#                  are kept in order of last logging, so expired ones are
+#                  always at the front and are dropped as new plates arrive;
+#                  max_entries caps memory even if the window is long.
+#   VoteRing     - fixed-size ring of the last N OCR readings with running
+#                  counts, replacing the list + pop(0) + Counter rebuild.
+
+
+class PlateDeduper:
+    def __init__(self, reentry_seconds=600.0, max_entries=4096):
+        self.reentry_seconds = float(reentry_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.last_logged = OrderedDict()  # plate -> time, oldest first
+
+    def __len__(self):
+        return len(self.last_logged)
+
+    def _expire(self, now):
+        cutoff = now - self.reentry_seconds
+        while self.last_logged:
+            plate, logged_at = next(iter(self.last_logged.items()))
+            if logged_at > cutoff:
+                break
+            self.last_logged.popitem(last=False)
+
+    def seen_recently(self, plate, now=None):
+        now = time.monotonic() if now is None else now
+        logged_at = self.last_logged.get(plate)
+        return logged_at is not None and now - logged_at < self.reentry_seconds
+
+    def mark(self, plate, now=None):
+        now = time.monotonic() if now is None else now
+        self.last_logged[plate] = now
+        self.last_logged.move_to_end(plate)
+        self._expire(now)
+        while len(self.last_logged) > self.max_entries:
+            self.last_logged.popitem(last=False)
+
+    def plates(self):
+        return list(self.last_logged)
+
+
+class VoteRing:
+    def __init__(self, size=5):
+        self.size = max(1, int(size))
+        self.ring = [None] * self.size
+        self.pos = 0
+        self.filled = 0
+        self.counts = {}
+
+    def __len__(self):
+        return self.filled
+
+    def add(self, text):
+        # Records a reading and returns the current majority
+        old = self.ring[self.pos]
+        if self.filled == self.size:
+            remaining = self.counts[old] - 1
+            if remaining:
+                self.counts[old] = remaining
+            else:
+                del self.counts[old]
+        else:
+            self.filled += 1
+        self.ring[self.pos] = text
+        self.pos = (self.pos + 1) % self.size
+        self.counts[text] = self.counts.get(text, 0) + 1
+        return self.majority()
+
+    def count(self, text):
+        return self.counts.get(text, 0)
+
+    def majority(self):
+        # O(size): walks the window from the oldest slot, so ties go to the
+        # reading seen first in the window, like
+        # Counter(window).most_common(1). (The counts dict's own order is not
+        # that: a reading keeps its position there after its first
+        # occurrence has left the window.)
+        best, best_count = None, 0
+        start = self.pos - self.filled
+        for i in range(self.filled):
+            text = self.ring[(start + i) % self.size]
+            count = self.counts[text]
+            if count > best_count:
+                best, best_count = text, count
+        return best
+
+    def clear(self):
+        self.ring = [None] * self.size
+        self.pos = 0
+        self.filled = 0
+        self.counts.clear()
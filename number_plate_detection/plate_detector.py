@@ -0,0 +1,231 @@
+import os
+
+import cv2
+import numpy as np
+
+# Plate detectors shared by app.py (/upload) and the number_plate.py webcam
+# loop. Every detector has detect(image) -> [(x, y, w, h), ...], best first,
+# in the coordinates of the image it was given (greyscale or BGR).
+#
+# Backends, picked with PLATE_DETECTOR:
+#   cascade (default) - the Haar cascade, with each entry point's existing
+#                       parameters (PRESETS)
+#   dnn               - an ONNX detector run through cv2.dnn on the CPU
+#                       (PLATE_DNN_MODEL, e.g. a YOLOv5/YOLOv8 plate model
+#                       exported at PLATE_DNN_SIZE)
+#
+# Wrappers, applied on top of either backend:
+#   PLATE_SEARCH_WIDTH=640 - look for plates in a copy downscaled to that
+#                            width, then re-detect around each hit at full
+#                            resolution so the crop handed to OCR is exact
+#   PLATE_ROI              - static region per camera, "x0,y0,x1,y1" as
+#                            fractions of the frame or a mask image (white =
+#                            search); "lane=spec;lane2=spec" sets it per lane
+
+PRESETS = {
+    # number_plate.py webcam loop
+    'webcam': {'scale_factor': 1.1, 'min_neighbors': 3, 'min_size': (60, 20)},
+    # app.py /upload
+    'upload': {'scale_factor': 1.1, 'min_neighbors': 5, 'min_size': None},
+}
+
+
+def to_gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def to_bgr(image):
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image
+
+
+def by_area(boxes):
+    return sorted(((int(x), int(y), int(w), int(h)) for x, y, w, h in boxes),
+                  key=lambda b: b[2] * b[3], reverse=True)
+
+
+class CascadeDetector:
+    name = 'cascade'
+
+    def __init__(self, cascade, scale_factor=1.1, min_neighbors=3, min_size=None):
+        self.cascade = cascade
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, image, scale=1.0):
+        # scale shrinks min_size when searching a downscaled copy
+        kwargs = {}
+        if self.min_size:
+            kwargs['minSize'] = (max(1, int(self.min_size[0] * scale)), max(1, int(self.min_size[1] * scale)))
+        boxes = self.cascade.detectMultiScale(to_gray(image), self.scale_factor, self.min_neighbors, **kwargs)
+        return by_area(boxes)
+
+
+class DnnDetector:
+    # Single-class YOLO-style ONNX model. Both output layouts are accepted:
+    # YOLOv5 (1, N, 5 + classes) with objectness, YOLOv8 (1, 4 + classes, N)
+    # without. Greyscale frames are expanded to three channels.
+    name = 'dnn'
+
+    def __init__(self, model_path, input_size=640, confidence=0.4, nms=0.45):
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = int(input_size)
+        self.confidence = float(confidence)
+        self.nms = float(nms)
+
+    def detect(self, image, scale=1.0):
+        image = to_bgr(image)
+        h, w = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(image, 1 / 255.0, (self.input_size, self.input_size), swapRB=True)
+        self.net.setInput(blob)
+        return self.parse(self.net.forward(), w / self.input_size, h / self.input_size)
+
+    def parse(self, output, fx, fy):
+        rows = output[0]
+        if rows.shape[0] < rows.shape[1]:
+            rows = rows.T  # YOLOv8: channels first, no objectness
+            scores = rows[:, 4:].max(axis=1)
+        elif rows.shape[1] > 5:
+            scores = rows[:, 4] * rows[:, 5:].max(axis=1)
+        else:
+            scores = rows[:, 4]
+        keep = scores >= self.confidence
+        rows, scores = rows[keep], scores[keep]
+        if not len(rows):
+            return []
+        cx, cy, bw, bh = rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3]
+        boxes = np.stack([(cx - bw / 2) * fx, (cy - bh / 2) * fy, bw * fx, bh * fy], axis=1)
+        boxes = boxes.round().astype(int).tolist()
+        order = cv2.dnn.NMSBoxes(boxes, scores.astype(float).tolist(), self.confidence, self.nms)
+        picked = sorted(np.array(order).flatten().tolist(), key=lambda i: -scores[i])
+        return [tuple(boxes[i]) for i in picked]
+
+
+class ScaledSearch:
+    # Coarse pass on a copy downscaled to search_width, then each hit is
+    # re-detected in a padded full-resolution window around it. A hit that
+    # cannot be refined is kept at its scaled-up coarse position.
+    def __init__(self, detector, search_width=640, margin=0.3, max_candidates=3):
+        self.detector = detector
+        self.name = f'{detector.name}+scaled{search_width}'
+        self.search_width = int(search_width)
+        self.margin = margin
+        self.max_candidates = max_candidates
+
+    def detect(self, image, scale=1.0):
+        h, w = image.shape[:2]
+        if w <= self.search_width:
+            return self.detector.detect(image, scale)
+        s = self.search_width / w
+        small = cv2.resize(image, (self.search_width, max(1, int(h * s))), interpolation=cv2.INTER_AREA)
+        found = []
+        for x, y, bw, bh in self.detector.detect(small, scale * s)[:self.max_candidates]:
+            x, y, bw, bh = int(x / s), int(y / s), int(bw / s), int(bh / s)
+            mx, my = int(bw * self.margin), int(bh * self.margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(w, x + bw + mx), min(h, y + bh + my)
+            refined = self.detector.detect(image[y0:y1, x0:x1], scale)
+            if refined:
+                rx, ry, rw, rh = refined[0]
+                found.append((x0 + rx, y0 + ry, rw, rh))
+            else:
+                found.append((x, y, bw, bh))
+        return found
+
+
+class RoiMask:
+    # Only searches the camera's region of interest: the frame is cropped to
+    # the region's bounding box (and pixels outside a non-rectangular mask are
+    # blacked out); boxes are shifted back to frame coordinates.
+    def __init__(self, detector, spec):
+        self.detector = detector
+        self.name = detector.name + '+roi'
+        self.rect = None
+        self.mask = None
+        parts = spec.split(',')
+        if len(parts) == 4 and not os.path.exists(spec):
+            self.rect = tuple(float(p) for p in parts)
+        else:
+            self.mask = cv2.imread(spec, cv2.IMREAD_GRAYSCALE)
+            if self.mask is None:
+                raise ValueError(f"Cannot read ROI mask {spec}")
+        self._cached = (None, None)
+
+    def _region(self, shape):
+        # (x0, y0, x1, y1, mask crop or None) for this frame size, cached
+        if self._cached[0] == shape:
+            return self._cached[1]
+        h, w = shape[:2]
+        if self.rect is not None:
+            fx0, fy0, fx1, fy1 = self.rect
+            region = (int(fx0 * w), int(fy0 * h), int(fx1 * w), int(fy1 * h), None)
+        else:
+            mask = cv2.resize(self.mask, (w, h), interpolation=cv2.INTER_NEAREST)
+            ys, xs = np.nonzero(mask)
+            if not len(xs):
+                region = (0, 0, 0, 0, None)
+            else:
+                x0, y0, x1, y1 = int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1
+                crop = mask[y0:y1, x0:x1]
+                region = (x0, y0, x1, y1, None if crop.all() else crop)
+        self._cached = (shape, region)
+        return region
+
+    def detect(self, image, scale=1.0):
+        x0, y0, x1, y1, mask = self._region(image.shape)
+        if x1 <= x0 or y1 <= y0:
+            return []
+        view = image[y0:y1, x0:x1]
+        if mask is not None:
+            view = cv2.bitwise_and(view, view, mask=mask)
+        return [(x + x0, y + y0, w, h) for x, y, w, h in self.detector.detect(view, scale)]
+
+
+def roi_for(lane, spec):
+    # Picks this lane's entry from "lane=spec;lane2=spec", or a bare spec
+    # that applies to every lane
+    if not spec:
+        return None
+    default = None
+    for part in spec.split(';'):
+        name, sep, value = part.partition('=')
+        if not sep:
+            default = part.strip()
+        elif name.strip() == lane:
+            return value.strip()
+    return default
+
+
+def detector_backend(config=None):
+    # PLATE_DETECTOR, normalised ("DNN" and " dnn" mean dnn); callers that
+    # only load the cascade for the cascade backend must ask this too
+    config = os.environ if config is None else config
+    return config.get('PLATE_DETECTOR', 'cascade').strip().lower()
+
+
+def build_detector(preset='webcam', cascade=None, lane=None, config=None):
+    # config defaults to the environment; keys as in the header comment
+    config = os.environ if config is None else config
+    backend = detector_backend(config)
+    if backend == 'dnn':
+        model = config.get('PLATE_DNN_MODEL')
+        if not model:
+            raise ValueError("PLATE_DETECTOR=dnn needs PLATE_DNN_MODEL")
+        detector = DnnDetector(model, input_size=int(config.get('PLATE_DNN_SIZE', 640)),
+                               confidence=float(config.get('PLATE_DNN_CONF', 0.4)))
+    elif backend == 'cascade':
+        if cascade is None or cascade.empty():
+            raise ValueError("Cascade file missing or failed to load")
+        detector = CascadeDetector(cascade, **PRESETS[preset])
+    else:
+        raise ValueError(f"Unknown PLATE_DETECTOR: {backend}")
+
+    search_width = int(config.get('PLATE_SEARCH_WIDTH', 0))
+    if search_width:
+        detector = ScaledSearch(detector, search_width)
+    roi = roi_for(lane, config.get('PLATE_ROI'))
+    if roi:
+        detector = RoiMask(detector, roi)
+    return detector
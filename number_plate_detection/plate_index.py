@@ -0,0 +1,127 @@
+# Approximate-match index over currently parked plates, used to resolve an
+# OCR'd exit plate (e.g. HRZGDK8337) to the parked car (HR26DK8337).
+#
+# Distance is an edit distance where substituting characters OCR commonly
+# confuses (0/O/D/Q, 2/Z, 6/G, 8/B, ...) is cheaper than any other edit.
+# Costs are integers in tenths of an edit so the BK-tree can key children
+# by exact distance. The weights keep the triangle inequality (a confusion
+# substitution is at most half an ordinary one), so BK-tree pruning is
+# exact and a lookup only visits a small part of the tree.
+
+CONFUSION_GROUPS = ['0ODQ', '1IL', '2Z', '5S', '6G', '8B', '4A']
+CONFUSION_COST = 4
+EDIT_COST = 10
+UNIT = 10  # cost of one ordinary edit
+
+_group_of = {}
+for _i, _group in enumerate(CONFUSION_GROUPS):
+    for _ch in _group:
+        _group_of[_ch] = _i
+
+
+def substitution_cost(a, b):
+    if a == b:
+        return 0
+    ga = _group_of.get(a)
+    if ga is not None and ga == _group_of.get(b):
+        return CONFUSION_COST
+    return EDIT_COST
+
+
+def ocr_distance(a, b):
+    prev = [j * EDIT_COST for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        cur = [i * EDIT_COST]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + EDIT_COST, cur[j - 1] + EDIT_COST,
+                           prev[j - 1] + substitution_cost(ca, cb)))
+        prev = cur
+    return prev[-1]
+
+
+class _Node:
+    __slots__ = ('key', 'children')
+
+    def __init__(self, key):
+        self.key = key
+        self.children = {}
+
+
+class PlateIndex:
+    def __init__(self, keys=()):
+        self.root = None
+        self.live = set()
+        self.removed = set()  # tombstones, dropped on the next rebuild
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return len(self.live)
+
+    def __contains__(self, key):
+        return key in self.live
+
+    def add(self, key):
+        if key in self.live:
+            return
+        self.live.add(key)
+        if key in self.removed:
+            self.removed.discard(key)  # node is still in the tree
+            return
+        if self.root is None:
+            self.root = _Node(key)
+            return
+        node = self.root
+        while True:
+            d = ocr_distance(key, node.key)
+            child = node.children.get(d)
+            if child is None:
+                node.children[d] = _Node(key)
+                return
+            node = child
+
+    def remove(self, key):
+        # BK-trees cannot unlink a node, so removals are tombstoned and the
+        # tree is rebuilt once tombstones outnumber live keys
+        if key not in self.live:
+            return
+        self.live.discard(key)
+        self.removed.add(key)
+        if len(self.removed) > max(len(self.live), 16):
+            self.rebuild()
+
+    def rebuild(self):
+        keys = list(self.live)
+        self.root = None
+        self.live = set()
+        self.removed = set()
+        for key in keys:
+            self.add(key)
+
+    def search(self, query, max_distance):
+        # All live keys within max_distance edits, nearest first, as (edits, key)
+        radius = int(round(max_distance * UNIT))
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = ocr_distance(query, node.key)
+            if d <= radius and node.key in self.live:
+                found.append((d, node.key))
+            for child_d, child in node.children.items():
+                if d - radius <= child_d <= d + radius:
+                    stack.append(child)
+        found.sort()
+        return [(d / UNIT, key) for d, key in found]
+
+    def best(self, query, max_distance):
+        # Nearest key as (key, edits), or None if nothing is close enough or
+        # the match is ambiguous: unless the nearest key is an exact match,
+        # any second key within max_distance means the reading could be
+        # either car, and guessing would free the wrong slot
+        matches = self.search(query, max_distance)
+        if not matches:
+            return None
+        if len(matches) > 1 and matches[0][0] > 0:
+            return None
+        return matches[0][1], matches[0][0]
@@ -0,0 +1,275 @@
+import base64
+import bisect
+import contextlib
+import csv
+import glob
+import gzip
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+
+import event_log
+from occupancy_store import normalize_plate
+
+# In-memory index over entry/exit history for the JSON query API.
+#
+# Sources are the event log (archived .csv.gz files, then logs/events.csv)
+# and the legacy vehicle_logs.csv / exit_logs.csv. Everything is read once on
+# first use; after that each query only reads bytes appended since the last
+# one. Open files are kept open, so when the event log rotates the tail of
+# the old file is still read through the same descriptor before the new file
+# is opened. If the log rotated more than once since the last query, the
+# archives in between are loaded too; the one holding the file that was
+# being tailed is recognised by its size and digest and skipped. A refresh
+# holds the event log's file lock so no rotation can happen halfway through.
+#
+# Records are kept sorted by key overall and per normalised plate, so a
+# time-range query is two bisects and a plate-prefix query walks only the
+# plates sharing the prefix. A key is the record itself,
+# (at, event, plate, slot, gate, source), plus n for the n-th identical row.
+# Timestamps are "YYYY-MM-DD HH:MM:SS" strings, which sort chronologically;
+# rows within the same second are ordered by their contents. Nothing in the
+# key depends on the order this process happened to read the files in, so a
+# cursor issued by one gunicorn worker pages the same way on another.
+
+LEGACY_ENTRY_LOG = 'vehicle_logs.csv'
+LEGACY_EXIT_LOG = 'exit_logs.csv'
+
+TIME_RE = re.compile(r'^\d{4}-\d{2}-\d{2}( \d{2}(:\d{2}(:\d{2})?)?)?$')
+MAX_LIMIT = 500
+
+
+def parse_event_row(row):
+    # Timestamp, Event, Plate, Slot, Gate, Source
+    if len(row) < 3 or row[0] == 'Timestamp':
+        return None
+    row = row + [''] * (6 - len(row))
+    return row[0], row[1], row[2], row[3], row[4], row[5]
+
+
+def parse_legacy_entry_row(row):
+    # "plate,slot,timestamp" (app.py) or "plate,timestamp" (save_data.py)
+    if not row or row[0] == 'Plate':
+        return None
+    if len(row) >= 3:
+        return row[2], 'entry', row[0], row[1], 'Entry', 'legacy'
+    if len(row) == 2:
+        return row[1], 'entry', row[0], '', 'Entry', 'legacy'
+    return None
+
+
+def parse_legacy_exit_row(row):
+    if len(row) < 2 or row[0] == 'Plate':
+        return None
+    return row[1], 'exit', row[0], '', 'Exit', 'legacy'
+
+
+class _Tail:
+    # Follows one file by offset; reopens it when it is replaced (rotation).
+    # rotated, if given, returns the rows to insert between the old file's
+    # last rows and the new file's first ones.
+    def __init__(self, path, parse, rotated=None):
+        self.path = path
+        self.parse = parse
+        self.rotated = rotated
+        self.file = None
+        self.inode = None
+        self.partial = b''
+        self.size = 0
+        self.digest = None
+        self.drained = []  # (size, sha1) of replaced files read to the end
+
+    def _open(self):
+        try:
+            self.file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return False
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.partial = b''
+        self.size = 0
+        self.digest = hashlib.sha1()
+        return True
+
+    def read(self):
+        rows = []
+        if self.file is None and not self._open():
+            return rows
+        rows += self._drain()
+        try:
+            replaced = os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            replaced = False
+        if replaced:
+            rows += self._drain()
+            self.drained.append((self.size, self.digest.hexdigest()))
+            self.file.close()
+            self.file = None
+            if self.rotated is not None:
+                rows += self.rotated()
+            if self._open():
+                rows += self._drain()
+        return rows
+
+    def _drain(self):
+        data = self.file.read()
+        if not data:
+            return []
+        self.size += len(data)
+        self.digest.update(data)
+        data = self.partial + data
+        # Keep an unterminated last line until the writer finishes it
+        cut = data.rfind(b'\n') + 1
+        self.partial = data[cut:]
+        lines = data[:cut].decode('utf-8', errors='replace').splitlines()
+        return [r for r in map(self.parse, csv.reader(lines)) if r is not None]
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError('invalid cursor')
+    if (not isinstance(key, list) or len(key) != 7 or not all(isinstance(v, str) for v in key[:6])
+            or not isinstance(key[6], int)):
+        raise ValueError('invalid cursor')
+    return tuple(key)
+
+
+class RecordIndex:
+    def __init__(self, log=None, legacy_entry=LEGACY_ENTRY_LOG, legacy_exit=LEGACY_EXIT_LOG):
+        self.log = log or event_log.events
+        self.archive_pattern = os.path.join(self.log.archive_dir, f'{self.log.name}-*.csv.gz')
+        self.log_tail = _Tail(self.log.path, parse_event_row, rotated=self._archive_rows)
+        self.tails = [_Tail(legacy_entry, parse_legacy_entry_row),
+                      _Tail(legacy_exit, parse_legacy_exit_row),
+                      self.log_tail]
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.archives = set()  # archive paths loaded, or read while live
+        self.count = 0
+        self.by_time = []      # sorted (at, event, plate, slot, gate, source, n)
+        self.by_plate = {}     # plate key -> sorted keys as in by_time
+        self.plate_keys = []   # sorted plate keys, for prefix scans
+
+    def __len__(self):
+        return self.count
+
+    def _add(self, record):
+        # n counts identical rows already indexed (same second, same fields)
+        n = bisect.bisect_left(self.by_time, record + (math.inf,)) - bisect.bisect_left(self.by_time, record)
+        key = record + (n,)
+        self.count += 1
+        _insort(self.by_time, key)
+        plate = normalize_plate(record[2])
+        entries = self.by_plate.get(plate)
+        if entries is None:
+            entries = self.by_plate[plate] = []
+            bisect.insort(self.plate_keys, plate)
+        _insort(entries, key)
+
+    def _archive_rows(self):
+        # Rows of archives not seen yet, oldest rotation first. Archives only
+        # ever hold rows written before the live file was rotated, so they
+        # are read once and never tailed. Names do not sort in rotation
+        # order (the date is the live file's last write, and "-1" sorts
+        # before "."), but archives are compressed one at a time under the
+        # log's lock, so their modification times do.
+        paths = [p for p in glob.glob(self.archive_pattern) if p not in self.archives]
+        rows = []
+        for path in sorted(paths, key=lambda p: (os.stat(p).st_mtime_ns, p)):
+            self.archives.add(path)
+            with gzip.open(path, 'rb') as f:
+                data = f.read()
+            signature = (len(data), hashlib.sha1(data).hexdigest())
+            if signature in self.log_tail.drained:
+                # Already read through the descriptor while it was live
+                self.log_tail.drained.remove(signature)
+                continue
+            lines = data.decode('utf-8', errors='replace').splitlines()
+            rows += [r for r in map(parse_event_row, csv.reader(lines)) if r is not None]
+        return rows
+
+    def _log_lock(self):
+        # Nothing to lock (or rotate) before the log directory exists
+        if not os.path.isdir(self.log.log_dir):
+            return contextlib.nullcontext()
+        return self.log.file_lock()
+
+    def refresh(self):
+        with self.lock, self._log_lock():
+            added = 0
+            if not self.loaded:
+                for row in self._archive_rows():
+                    self._add(row)
+                self.loaded = True
+            for tail in self.tails:
+                for row in tail.read():
+                    self._add(row)
+                    added += 1
+        return added
+
+    def query(self, start=None, end=None, plate=None, event=None, cursor=None, limit=50):
+        # Newest first. start/end are timestamps or prefixes of one
+        # ("2025-06-16" covers the whole day); end is inclusive. Returns
+        # (records, next_cursor or None).
+        limit = max(1, min(int(limit), MAX_LIMIT))
+        self.refresh()
+        lo = (start,) if start else None
+        hi = (end + '\uffff',) if end else None
+        if cursor:
+            after = decode_cursor(cursor)
+            hi = after if hi is None or after < hi else hi
+
+        with self.lock:
+            if plate:
+                prefix = normalize_plate(plate)
+                first = bisect.bisect_left(self.plate_keys, prefix)
+                last = bisect.bisect_left(self.plate_keys, prefix + '\uffff')
+                streams = [_descending(self.by_plate[k], lo, hi) for k in self.plate_keys[first:last]]
+                keys = heapq.merge(*streams, reverse=True)
+            else:
+                keys = _descending(self.by_time, lo, hi)
+
+            page = []
+            for key in keys:
+                record = key[:6]
+                if event and record[1] != event:
+                    continue
+                if len(page) == limit:
+                    return page, encode_cursor(page_key)
+                page.append(_as_dict(record))
+                page_key = key
+        return page, None
+
+
+def _insort(keys, key):
+    # Rows arrive almost in time order, so this is usually an append
+    if not keys or keys[-1] <= key:
+        keys.append(key)
+    else:
+        bisect.insort(keys, key)
+
+
+def _descending(keys, lo, hi):
+    first = bisect.bisect_left(keys, lo) if lo else 0
+    last = bisect.bisect_left(keys, hi) if hi else len(keys)
+    for i in range(last - 1, first - 1, -1):
+        yield keys[i]
+
+
+def _as_dict(record):
+    at, event, plate, slot, gate, source = record
+    return {'time': at, 'event': event, 'plate': plate, 'slot': slot or None,
+            'gate': gate or None, 'source': source}
+
+
+def valid_time(value):
+    return value is None or bool(TIME_RE.match(value))
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+
+# Re-runs plate detection and OCR over archived captures, e.g. to backfill
+# corrected plates after the pipeline improves or to audit a dispute:
+#
+#   python reprocess.py plates/plate_img static/videos --output rerun.jsonl --workers 4
+#
+# Inputs are image files and video files (directories are walked). Each
+# image is one task; videos are split into chunks of --chunk frames, of which
+# every --every-th frame is read. Tasks are fanned out over a process pool
+# whose workers load the detector and OCR engine once.
+#
+# Engines reuse the existing recognition paths:
+#   easyocr   - app.py /upload: cascade (upload preset) -> grey 1024x256 ->
+#               EasyOCR, best result longer than 3 characters
+#   tesseract - number_plate.py: cascade (webcam preset) -> preprocess_plate
+#               -> Tesseract --psm 7 -> clean_plate_text
+# Every result also carries clean_plate_text() of the text ("valid"), which
+# is empty unless it looks like an Indian plate.
+#
+# Output is JSON lines, one per finished task, written as tasks complete.
+# Running again with the same --output skips tasks already in the file, so an
+# interrupted run resumes where it stopped.
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTS = ('.mp4', '.avi', '.mkv', '.mov')
+
+_engine = None
+
+
+class Engine:
+    def __init__(self, name, crops=False):
+        import number_plate
+        self.np = number_plate
+        self.name = name
+        self.crops = crops
+        self.detector = None
+        if name == 'easyocr':
+            import models
+            if not crops:
+                self.detector = models.get_detector()
+            self.reader = models.get_reader()
+        elif not crops:
+            self.detector = number_plate.load_detector('reprocess')
+            if self.detector is None:
+                raise RuntimeError("Plate detector failed to load")
+
+    def recognize(self, img):
+        # (text, box) for the largest plate in a BGR image, or None
+        if self.crops:
+            box = (0, 0, img.shape[1], img.shape[0])
+        else:
+            boxes = self.detector.detect(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+            if not boxes:
+                return None
+            box = boxes[0]
+        x, y, w, h = box
+        crop = img[y:y+h, x:x+w]
+        if self.name == 'easyocr':
+            prepared = cv2.resize(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), (1024, 256))
+            text = ""
+            for (_, candidate, _) in sorted(self.reader.readtext(prepared), key=lambda r: r[2], reverse=True):
+                if len(candidate) > 3:
+                    text = candidate.strip().replace(" ", "")
+                    break
+        else:
+            text = self.np.read_plate(crop)
+        return text, [int(v) for v in box]
+
+
+def init_worker(engine, crops):
+    global _engine
+    # Parallelism comes from the pool; keep each worker single-threaded
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    _engine = Engine(engine, crops)
+
+
+def result_row(text, box, frame=None):
+    row = {'plate': text, 'valid': _engine.np.clean_plate_text(text) if text else "", 'box': box}
+    if frame is not None:
+        row['frame'] = frame
+    return row
+
+
+def run_task(task):
+    # Errors are returned rather than raised: some OCR exceptions (e.g.
+    # pytesseract's) cannot be unpickled and would break the whole pool
+    try:
+        return process(*task)
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}', 'frames': 0, 'results': []}
+
+
+def process(kind, path, start, stop, every):
+    t0 = time.perf_counter()
+    results = []
+    frames = 0
+    if kind == 'image':
+        img = cv2.imread(path)
+        if img is None:
+            return {'error': 'unreadable image', 'frames': 0, 'results': [], 'ms': 0.0}
+        frames = 1
+        found = _engine.recognize(img)
+        if found and found[0]:
+            results.append(result_row(*found))
+    else:
+        cap = cv2.VideoCapture(path)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for index in range(start, stop):
+            if (index - start) % every:
+                if not cap.grab():
+                    break
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames += 1
+            found = _engine.recognize(frame)
+            if found and found[0]:
+                results.append(result_row(*found, frame=index))
+        cap.release()
+    return {'frames': frames, 'results': results, 'ms': round((time.perf_counter() - t0) * 1000, 3)}
+
+
+def task_key(task):
+    kind, path, start, stop, _ = task
+    return path if kind == 'image' else f'{path}#{start}-{stop}'
+
+
+def find_tasks(inputs, chunk, every):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                dirs.sort()
+                files += [os.path.join(root, n) for n in sorted(names)]
+        else:
+            files.append(item)
+    tasks = []
+    for path in files:
+        ext = os.path.splitext(path)[1].lower()
+        if ext in IMAGE_EXTS:
+            tasks.append(('image', path, 0, 1, 1))
+        elif ext in VIDEO_EXTS:
+            cap = cv2.VideoCapture(path)
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            for start in range(0, total, chunk):
+                tasks.append(('video', path, start, min(total, start + chunk), every))
+    return tasks
+
+
+def load_done(output):
+    # Keys of tasks already in the output. Failed tasks and a torn last line
+    # (killed while writing) are ignored, so those tasks are run again
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, 'rb+') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(row, dict) and 'task' in row and 'error' not in row:
+                done.add(row['task'])
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run plate detection and OCR over archived images and videos")
+    parser.add_argument('inputs', nargs='+', help="image/video files or directories")
+    parser.add_argument('--output', default='reprocess.jsonl')
+    parser.add_argument('--engine', choices=['easyocr', 'tesseract'], default='easyocr')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--every', type=int, default=5, help="read every Nth video frame")
+    parser.add_argument('--chunk', type=int, default=300, help="video frames per task")
+    parser.add_argument('--crops', action='store_true', help="inputs are plate crops; skip detection")
+    parser.add_argument('--progress', type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    tasks = find_tasks(args.inputs, max(1, args.chunk), max(1, args.every))
+    done = load_done(args.output)
+    pending = [t for t in tasks if task_key(t) not in done]
+    print(f"{len(tasks)} tasks, {len(tasks) - len(pending)} already in {args.output}, "
+          f"{len(pending)} to run on {args.workers} workers ({args.engine})")
+    if not pending:
+        return 0
+
+    started = time.perf_counter()
+    last_report = started
+    finished = frames = plates = errors = 0
+    queue = iter(pending)
+    with open(args.output, 'a') as out, \
+            ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(args.engine, args.crops)) as pool:
+        running = {}
+        try:
+            while True:
+                # Keep a couple of tasks per worker in flight, not the whole list
+                while len(running) < args.workers * 2:
+                    task = next(queue, None)
+                    if task is None:
+                        break
+                    running[pool.submit(run_task, task)] = task
+                if not running:
+                    break
+                complete, _ = wait(running, timeout=args.progress, return_when=FIRST_COMPLETED)
+                for future in complete:
+                    task = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'error': str(e), 'frames': 0, 'results': []}
+                    errors += 'error' in result
+                    finished += 1
+                    frames += result['frames']
+                    plates += len(result['results'])
+                    out.write(json.dumps({'task': task_key(task), 'kind': task[0], 'file': task[1],
+                                          'engine': args.engine, **result}) + '\n')
+                    out.flush()
+                now = time.perf_counter()
+                if now - last_report >= args.progress:
+                    last_report = now
+                    elapsed = now - started
+                    print(f"  {finished}/{len(pending)} tasks, {frames} frames, {plates} plates, "
+                          f"{frames / elapsed:.1f} frames/s")
+        except KeyboardInterrupt:
+            print("Interrupted; finished tasks are saved, run again to resume")
+            pool.shutdown(wait=False, cancel_futures=True)
+            return 130
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {finished} tasks, {frames} frames, {plates} plates, {errors} errors in {elapsed:.1f}s "
+          f"({frames / elapsed:.1f} frames/s, {finished / elapsed:.1f} tasks/s) -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
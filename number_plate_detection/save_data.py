@@ -1,18 +1,10 @@
-import csv
-import os
-from datetime import datetime
+import event_log
 
-def save_vehicle_log(plate_number):
+def save_vehicle_log(plate_number, slot="", gate="Entry", path=None, status="IN", source="webcam"):
     # Plate number ke aage ya peeche agar extra space ho toh hatao
     plate_number = plate_number.strip().replace(" ", "")
-    
-    log_path = 'vehicle_logs.csv'
-    entry_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    file_exists = os.path.isfile(log_path)
-
-    with open(log_path, 'a', newline='') as file:
-        writer = csv.writer(file)
-        if not file_exists:
-            writer.writerow(['Plate', 'Timestamp'])  # header row
-        writer.writerow([plate_number, entry_time])
+    # Rows go to the shared event log (see event_log.py); the route is not
+    # stored since it follows from the slot
+    event = "entry" if status == "IN" else "exit"
+    event_log.record(event, plate_number, slot=slot, gate=gate, source=source)
@@ -0,0 +1,73 @@
+import json
+import threading
+
+import metrics
+
+# In-process pub/sub for slot changes, feeding the /api/slots/events stream.
+#
+# publish() serialises the event once and stores it in a fixed-size ring
+# under a sequence number; it never touches subscribers, so its cost does
+# not depend on how many dashboards are connected and a slow client cannot
+# hold up the gate request that published. Each subscriber keeps its own
+# last-seen sequence number and reads the ring at its own pace. A client
+# that falls more than `capacity` events behind gets None from wait() and
+# should send a fresh snapshot instead.
+#
+# The broker is per process: events published by another gunicorn worker
+# are not seen here, so streams also re-send the snapshot when the
+# occupancy store reports a commit from another worker.
+
+ALLOCATED = 'slot-allocated'
+FREED = 'slot-freed'
+
+published = metrics.registry.register(metrics.Counter(
+    'slot_events_published_total', 'Slot events published to live subscribers', ('event',)))
+subscribers = metrics.registry.register(metrics.Gauge(
+    'slot_events_subscribers', 'Open slot event streams in this process'))
+
+
+class SlotEvents:
+    def __init__(self, capacity=1024):
+        self.capacity = max(1, int(capacity))
+        self.ring = [None] * self.capacity
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.clients = 0
+
+    def publish(self, kind, slot, plate):
+        data = json.dumps({'slot': slot, 'plate': plate}, separators=(',', ':'))
+        with self.cond:
+            self.seq += 1
+            self.ring[self.seq % self.capacity] = (self.seq, kind, data)
+            self.cond.notify_all()
+        published.inc(event=kind)
+
+    def wait(self, after, timeout=None):
+        # Events newer than `after` as [(seq, kind, json)], [] on timeout, or
+        # None if some of them have already been overwritten
+        with self.cond:
+            if self.seq == after:
+                self.cond.wait(timeout)
+            if self.seq - after > self.capacity:
+                return None
+            return [self.ring[s % self.capacity] for s in range(after + 1, self.seq + 1)]
+
+    def subscribe(self, limit):
+        # Claims a subscriber slot; False once `limit` streams are open
+        with self.cond:
+            if self.clients >= limit:
+                return False
+            self.clients += 1
+        subscribers.inc()
+        return True
+
+    def unsubscribe(self):
+        with self.cond:
+            self.clients -= 1
+        subscribers.dec()
+
+
+def format_event(kind, data, seq=None):
+    # One Server-Sent Events message; data is already JSON
+    head = f'id: {seq}\n' if seq is not None else ''
+    return f'{head}event: {kind}\ndata: {data}\n\n'
@@ -0,0 +1,261 @@
+import ctypes
+import ctypes.util
+import glob
+import logging
+import os
+import queue
+import shutil
+import threading
+
+import cv2
+import numpy as np
+import pytesseract
+
+# Long-lived Tesseract for the webcam OCR path. pytesseract.image_to_string
+# starts a tesseract process per call and round-trips the image through temp
+# files, so most of the OCR time went on process start-up and loading the
+# language model. Here the model is loaded once per process with the plate
+# configuration (--oem 3 --psm 7, A-Z0-9 whitelist) already applied, and
+# numpy images are handed over in memory.
+#
+# Engines, picked with TESSERACT_ENGINE:
+#   auto (default) - the first of tesserocr, capi, spawn that loads
+#   tesserocr      - the tesserocr binding (pip install tesserocr)
+#   capi           - libtesseract's C API through ctypes; no extra package,
+#                    only the library that ships with tesseract
+#   spawn          - the old pytesseract call, one process per image
+#
+# Paths, so the same code runs on Linux and Windows:
+#   TESSERACT_CMD   - tesseract executable for spawn (default: on PATH, or
+#                     the usual Windows install location)
+#   TESSERACT_LIB   - libtesseract for capi (default: found by ctypes, or
+#                     next to TESSERACT_CMD on Windows)
+#   TESSDATA_PREFIX - tessdata directory, if not the build's default
+#
+# A Tesseract handle is not thread-safe, so each engine keeps a small pool of
+# handles and a thread borrows one per image. Handles are created lazily and
+# again after a fork (pipeline.py runs OCR in worker processes).
+
+WINDOWS_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+PLATE_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+PSM_SINGLE_LINE = 7
+OEM_DEFAULT = 3
+CONFIG = rf'--oem {OEM_DEFAULT} --psm {PSM_SINGLE_LINE} -c tessedit_char_whitelist={PLATE_CHARS}'
+
+ENGINE = os.environ.get('TESSERACT_ENGINE', 'auto').lower()
+TESSERACT_CMD = os.environ.get('TESSERACT_CMD') or shutil.which('tesseract') or (
+    WINDOWS_CMD if os.name == 'nt' else 'tesseract')
+TESSERACT_LIB = os.environ.get('TESSERACT_LIB')
+TESSDATA = os.environ.get('TESSDATA_PREFIX')
+LANG = os.environ.get('TESSERACT_LANG', 'eng')
+MAX_HANDLES = int(os.environ.get('TESSERACT_HANDLES', 4))
+
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+
+def as_gray(image):
+    # Contiguous 8-bit greyscale, which is what preprocess_plate returns
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.shape[2] == 3 else image[:, :, 0]
+    return np.ascontiguousarray(image, dtype=np.uint8)
+
+
+class SpawnEngine:
+    name = 'spawn'
+
+    def __init__(self):
+        pytesseract.get_tesseract_version()  # fails fast if the binary is missing
+
+    def image_to_string(self, image):
+        return pytesseract.image_to_string(image, config=CONFIG)
+
+    def close(self):
+        pass
+
+
+class HandlePool:
+    # Up to max_handles initialised handles; image_to_string borrows one
+    def __init__(self, max_handles=MAX_HANDLES):
+        self.max_handles = max(1, int(max_handles))
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def new_handle(self):
+        raise NotImplementedError
+
+    def free_handle(self, handle):
+        raise NotImplementedError
+
+    def recognize(self, handle, gray):
+        raise NotImplementedError
+
+    def acquire(self):
+        if self.pid != os.getpid():
+            # Forked: the parent's handles are not ours to use or free
+            with self.lock:
+                self.idle = queue.LifoQueue()
+                self.created = 0
+                self.pid = os.getpid()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            grow = self.created < self.max_handles
+            if grow:
+                self.created += 1
+        if not grow:
+            return self.idle.get()
+        try:
+            return self.new_handle()
+        except BaseException:
+            with self.lock:
+                self.created -= 1
+            raise
+
+    def image_to_string(self, image):
+        gray = as_gray(image)
+        handle = self.acquire()
+        try:
+            return self.recognize(handle, gray)
+        finally:
+            self.idle.put(handle)
+
+    def close(self):
+        while True:
+            try:
+                handle = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self.free_handle(handle)
+            self.created -= 1
+
+
+class TesserocrEngine(HandlePool):
+    name = 'tesserocr'
+
+    def __init__(self, max_handles=MAX_HANDLES):
+        import tesserocr
+        self.tesserocr = tesserocr
+        super().__init__(max_handles)
+        self.idle.put(self.new_handle())  # fails fast if tessdata is missing
+        self.created = 1
+
+    def new_handle(self):
+        kwargs = {'path': TESSDATA} if TESSDATA else {}
+        api = self.tesserocr.PyTessBaseAPI(lang=LANG, psm=self.tesserocr.PSM.SINGLE_LINE,
+                                           oem=self.tesserocr.OEM.DEFAULT, **kwargs)
+        api.SetVariable('tessedit_char_whitelist', PLATE_CHARS)
+        return api
+
+    def free_handle(self, api):
+        api.End()
+
+    def recognize(self, api, gray):
+        h, w = gray.shape
+        api.SetImageBytes(gray.tobytes(), w, h, 1, w)
+        return api.GetUTF8Text()
+
+
+def find_library():
+    if TESSERACT_LIB:
+        return TESSERACT_LIB
+    found = ctypes.util.find_library('tesseract')
+    if found:
+        return found
+    if os.name == 'nt':
+        dlls = sorted(glob.glob(os.path.join(os.path.dirname(TESSERACT_CMD), 'libtesseract*.dll')))
+        if dlls:
+            return dlls[-1]
+    raise OSError("libtesseract not found; set TESSERACT_LIB")
+
+
+class CapiEngine(HandlePool):
+    name = 'capi'
+
+    def __init__(self, max_handles=MAX_HANDLES):
+        lib = ctypes.CDLL(find_library())
+        lib.TessBaseAPICreate.restype = ctypes.c_void_p
+        lib.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIInit2.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+        lib.TessBaseAPIInit2.restype = ctypes.c_int
+        lib.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPISetVariable.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPISetVariable.restype = ctypes.c_int
+        lib.TessBaseAPISetImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p,
+                                            ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        lib.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p  # freed with TessDeleteText
+        lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIClear.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+        self.lib = lib
+        super().__init__(max_handles)
+        self.idle.put(self.new_handle())  # fails fast if tessdata is missing
+        self.created = 1
+
+    def new_handle(self):
+        lib = self.lib
+        handle = lib.TessBaseAPICreate()
+        datapath = TESSDATA.encode() if TESSDATA else None
+        if lib.TessBaseAPIInit2(handle, datapath, LANG.encode(), OEM_DEFAULT) != 0:
+            lib.TessBaseAPIDelete(handle)
+            raise OSError(f"Tesseract could not load language '{LANG}' (TESSDATA_PREFIX={TESSDATA})")
+        lib.TessBaseAPISetPageSegMode(handle, PSM_SINGLE_LINE)
+        lib.TessBaseAPISetVariable(handle, b'tessedit_char_whitelist', PLATE_CHARS.encode())
+        return handle
+
+    def free_handle(self, handle):
+        self.lib.TessBaseAPIEnd(handle)
+        self.lib.TessBaseAPIDelete(handle)
+
+    def recognize(self, handle, gray):
+        lib = self.lib
+        h, w = gray.shape
+        lib.TessBaseAPISetImage(handle, gray.ctypes.data, w, h, 1, w)
+        text = lib.TessBaseAPIGetUTF8Text(handle)
+        try:
+            return ctypes.string_at(text).decode('utf-8', 'replace') if text else ''
+        finally:
+            if text:
+                lib.TessDeleteText(text)
+            lib.TessBaseAPIClear(handle)
+
+
+ENGINES = {'tesserocr': TesserocrEngine, 'capi': CapiEngine, 'spawn': SpawnEngine}
+
+_lock = threading.Lock()
+_engine = None
+_engine_pid = None
+
+
+def load_engine(name=ENGINE):
+    if name != 'auto':
+        if name not in ENGINES:
+            raise ValueError(f"Unknown TESSERACT_ENGINE: {name}")
+        return ENGINES[name]()
+    errors = []
+    for candidate in ('tesserocr', 'capi', 'spawn'):
+        try:
+            return ENGINES[candidate]()
+        except (ImportError, OSError, RuntimeError, pytesseract.TesseractNotFoundError) as e:
+            errors.append(f"{candidate}: {e}")
+    raise OSError("No Tesseract engine available (" + "; ".join(errors) + ")")
+
+
+def get_engine():
+    global _engine, _engine_pid
+    if _engine is None or _engine_pid != os.getpid():
+        with _lock:
+            if _engine is None or _engine_pid != os.getpid():
+                _engine = load_engine()
+                _engine_pid = os.getpid()
+                logging.info(f"Tesseract engine: {_engine.name}")
+    return _engine
+
+
+def image_to_string(image):
+    # Raw Tesseract text for a plate image (numpy, greyscale or BGR)
+    return get_engine().image_to_string(image)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app's modules are imported as top-level modules from this directory's
+# parent, the same way app.py and number_plate.py import each other
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionControl, QueueFull
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+class Waiter(threading.Thread):
+    # Acquires in a lane from another thread and records the outcome
+    def __init__(self, admission, lane, admitted_order=None):
+        super().__init__(daemon=True)
+        self.admission = admission
+        self.lane = lane
+        self.admitted_order = admitted_order
+        self.ticket = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.ticket = self.admission.acquire(self.lane)
+        except QueueFull as e:
+            self.error = e
+            return
+        if self.admitted_order is not None:
+            self.admitted_order.append(self.lane)
+        self.admission.release(self.ticket)
+
+
+def start_waiting(admission, lane, admitted_order=None):
+    # Returns once the new request is queued (or already finished)
+    queued = set(map(id, admission.waiting))
+    waiter = Waiter(admission, lane, admitted_order)
+    waiter.start()
+    wait_until(lambda: set(map(id, admission.waiting)) - queued or not waiter.is_alive())
+    return waiter
+
+
+def test_admits_up_to_concurrency_then_queues():
+    admission = AdmissionControl(concurrency=2, max_queue=1)
+    first, second = admission.acquire('entry'), admission.acquire('entry')
+    waiter = start_waiting(admission, 'entry')
+    assert admission.stats()['waiting'] == {'exit': 0, 'entry': 1}
+    admission.release(first)
+    waiter.join(timeout=5)
+    assert waiter.error is None
+    admission.release(second)
+    assert admission.stats()['running'] == 0
+
+
+def test_exit_runs_before_an_earlier_entry():
+    admission = AdmissionControl(concurrency=1, max_queue=2)
+    running = admission.acquire('entry')
+    order = []
+    entry = start_waiting(admission, 'entry', order)
+    exit_ = start_waiting(admission, 'exit', order)
+    admission.release(running)
+    entry.join(timeout=5)
+    exit_.join(timeout=5)
+    assert order == ['exit', 'entry']
+
+
+def test_exit_evicts_the_newest_waiting_entry_when_full():
+    admission = AdmissionControl(concurrency=1, max_queue=2)
+    running = admission.acquire('entry')
+    older = start_waiting(admission, 'entry')
+    newer = start_waiting(admission, 'entry')
+    exit_ = start_waiting(admission, 'exit')
+
+    newer.join(timeout=5)
+    assert isinstance(newer.error, QueueFull)
+    assert newer.error.reason == 'evicted'
+    assert newer.error.retry_after >= 1
+    assert older.is_alive()
+
+    admission.release(running)
+    older.join(timeout=5)
+    exit_.join(timeout=5)
+    assert older.error is None and exit_.error is None
+
+
+def test_entry_and_exit_rejected_when_only_exits_wait():
+    admission = AdmissionControl(concurrency=1, max_queue=1)
+    running = admission.acquire('entry')
+    waiting_exit = start_waiting(admission, 'exit')
+    for lane in ('entry', 'exit'):
+        with pytest.raises(QueueFull) as e:
+            admission.acquire(lane)
+        assert e.value.reason == 'full'
+    admission.release(running)
+    waiting_exit.join(timeout=5)
+    assert waiting_exit.error is None
+
+
+def test_waiting_too_long_is_rejected():
+    admission = AdmissionControl(concurrency=1, max_queue=1, max_wait=0.05)
+    running = admission.acquire('exit')
+    with pytest.raises(QueueFull) as e:
+        admission.acquire('entry')
+    assert e.value.reason == 'timeout'
+    assert admission.stats()['waiting'] == {'exit': 0, 'entry': 0}
+    admission.release(running)
@@ -0,0 +1,122 @@
+import contextlib
+import multiprocessing as mp
+import sqlite3
+
+import pytest
+
+from allocator import SlotAllocator
+from occupancy_store import OccupancyStore
+
+PROCESSES = 4
+PLATES_PER_PROCESS = 20  # 80 cars for the 50-slot default lot
+
+
+def make_allocator(tmp_path):
+    return SlotAllocator(store=OccupancyStore(str(tmp_path / 'occupancy.db')),
+                         slots_file=str(tmp_path / 'slots.txt'))
+
+
+def allocate_in_process(tmp_path, worker, start, results):
+    allocator = make_allocator(tmp_path)
+    start.wait()
+    for i in range(PLATES_PER_PROCESS):
+        plate = f'W{worker}CAR{i:02d}'
+        result = allocator.allocate(plate)
+        results.put((plate, result['slot'] if result else None))
+
+
+def release_in_process(tmp_path, plates, results):
+    allocator = make_allocator(tmp_path)
+    results.put([allocator.release(plate) for plate in plates])
+
+
+@pytest.fixture
+def ctx():
+    return mp.get_context('fork')
+
+
+def test_concurrent_processes_never_share_a_slot(tmp_path, ctx):
+    make_allocator(tmp_path)  # creates the database before the race
+    start = ctx.Event()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=allocate_in_process, args=(tmp_path, w, start, results))
+             for w in range(PROCESSES)]
+    for proc in procs:
+        proc.start()
+    start.set()
+    allocated = dict(results.get(timeout=60) for _ in range(PROCESSES * PLATES_PER_PROCESS))
+    for proc in procs:
+        proc.join(timeout=60)
+        assert proc.exitcode == 0
+
+    slots = [slot for slot in allocated.values() if slot is not None]
+    total = len(make_allocator(tmp_path).routes)
+    assert len(slots) == total
+    assert len(set(slots)) == len(slots)
+    assert list(allocated.values()).count(None) == PROCESSES * PLATES_PER_PROCESS - total
+
+    store = OccupancyStore(str(tmp_path / 'occupancy.db'))
+    assert {slot: plate for plate, slot in allocated.items() if slot} == store.occupied()
+
+
+def test_slot_freed_in_another_process_is_reused(tmp_path, ctx):
+    allocator = make_allocator(tmp_path)
+    total = len(allocator.routes)
+    for i in range(total):
+        assert allocator.allocate(f'CAR{i:02d}') is not None
+    assert allocator.allocate('LATECOMER') is None
+
+    results = ctx.Queue()
+    proc = ctx.Process(target=release_in_process, args=(tmp_path, ['CAR07', 'CAR30'], results))
+    proc.start()
+    freed = results.get(timeout=60)
+    proc.join(timeout=60)
+    assert all(freed)
+
+    first = allocator.allocate('LATECOMER')
+    second = allocator.allocate('LATECOMER2')
+    assert {first['slot'], second['slot']} == set(freed)
+    assert allocator.allocate('LATECOMER3') is None
+
+
+def test_allocating_a_parked_plate_returns_its_slot(tmp_path):
+    allocator = make_allocator(tmp_path)
+    first = allocator.allocate('HR26DK8337')
+    assert allocator.allocate('hr26dk8337')['slot'] == first['slot']
+    assert len(allocator.store.occupied()) == 1
+
+
+class FailingCommitStore(OccupancyStore):
+    # Rolls back and raises where COMMIT would run, like a busy database
+    fail = False
+
+    @contextlib.contextmanager
+    def transaction(self):
+        if not self.fail:
+            with super().transaction() as conn:
+                yield conn
+            return
+        with self.lock:
+            conn = self.conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            finally:
+                conn.execute("ROLLBACK")
+            raise sqlite3.OperationalError('database is locked')
+
+
+def test_failed_commit_keeps_the_slot_on_offer(tmp_path):
+    store = FailingCommitStore(str(tmp_path / 'occupancy.db'))
+    allocator = SlotAllocator(store=store, slots_file=str(tmp_path / 'slots.txt'))
+    nearest = allocator.allocate('PROBE')['slot']
+    allocator.release('PROBE')
+
+    store.fail = True
+    with pytest.raises(sqlite3.OperationalError):
+        allocator.allocate('HR26DK8337')
+    assert store.occupied() == {}
+    assert nearest in allocator.free_slots
+
+    store.fail = False
+    assert allocator.allocate('HR26DK8337')['slot'] == nearest
@@ -0,0 +1,60 @@
+import io
+
+import cv2
+import numpy as np
+from flask import Flask, jsonify, request
+
+import image_input
+from image_input import UploadRequest, decode_request_image, iter_request_frames
+
+
+def make_app():
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    app.config['MAX_CONTENT_LENGTH'] = 4 * 1024 * 1024
+
+    @app.route('/one', methods=['POST'])
+    def one():
+        img, error = decode_request_image(request)
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify({'shape': list(img.shape)})
+
+    @app.route('/many', methods=['POST'])
+    def many():
+        return jsonify({'frames': len(list(iter_request_frames(request)))})
+
+    return app
+
+
+def jpeg(size=(48, 64)):
+    img = np.random.default_rng(0).integers(0, 255, size + (3,), dtype=np.uint8)
+    return cv2.imencode('.jpg', img)[1].tobytes()
+
+
+def test_multipart_image_is_decoded_from_the_parsed_part(monkeypatch):
+    copies = []
+    monkeypatch.setattr(image_input, 'read_into_buffer', lambda *a, **k: copies.append(a))
+    # Large enough that werkzeug's default factory would spool it to disk
+    data = jpeg((600, 800))
+    assert len(data) > 500 * 1024
+    res = make_app().test_client().post(
+        '/one', data={'image': (io.BytesIO(data), 'car.jpg', 'image/jpeg')},
+        content_type='multipart/form-data')
+    assert res.status_code == 200
+    assert res.get_json()['shape'] == [600, 800, 3]
+    assert copies == []
+
+
+def test_multipart_burst_decodes_every_image_part():
+    data = {'a': (io.BytesIO(jpeg()), 'a.jpg', 'image/jpeg'),
+            'b': (io.BytesIO(jpeg()), 'b.jpg', 'image/jpeg')}
+    res = make_app().test_client().post('/many', data=data, content_type='multipart/form-data')
+    assert res.get_json() == {'frames': 2}
+
+
+def test_part_buffer_reads_parts_on_disk(tmp_path):
+    path = tmp_path / 'part'
+    path.write_bytes(jpeg())
+    with open(path, 'rb') as f:
+        assert image_input.decode_part(f).shape == (48, 64, 3)
@@ -0,0 +1,63 @@
+import pytest
+
+from lot_layout import ROWS, SLOTS_PER_ROW, RouteTable, default_layout, generate_layout
+
+
+# Routes parking.cpp printed for row "a" (every row is the same), as slot
+# numbers between Entry and Exit. Slot 5 is the one deliberate change: the
+# C++ walked 6..10 from there although the row's 5 -> 10 shortcut is shorter.
+PARKING_CPP_ROUTES = {
+    1: [1, 2, 3, 4, 5, 10],
+    2: [1, 2, 3, 4, 5, 10],
+    3: [1, 2, 3, 4, 5, 10],
+    4: [1, 2, 3, 4, 5, 10],
+    5: [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+    6: [1, 6, 7, 8, 9, 10],
+    7: [1, 6, 7, 8, 9, 10],
+    8: [1, 6, 7, 8, 9, 10],
+    9: [1, 6, 7, 8, 9, 10],
+    10: [1, 2, 3, 4, 5, 10],
+}
+ROUTES = {**PARKING_CPP_ROUTES, 5: [1, 2, 3, 4, 5, 10]}
+
+
+@pytest.fixture(scope='module')
+def routes():
+    return RouteTable(default_layout())
+
+
+@pytest.mark.parametrize('slot', [f'{r}{i}' for r in ROWS for i in range(1, SLOTS_PER_ROW + 1)])
+def test_default_lot_paths(routes, slot):
+    row, n = slot[0], int(slot[1:])
+    assert routes.path(slot) == ['Entry'] + [f'{row}{i}' for i in ROUTES[n]] + ['Exit']
+
+
+def test_only_slot_5_differs_from_parking_cpp():
+    assert [n for n in ROUTES if ROUTES[n] != PARKING_CPP_ROUTES[n]] == [5]
+
+
+def test_default_lot_allocation_order_matches_parking_cpp(routes):
+    # parking.cpp sorted (cost, slot name) pairs and took the first free one
+    ranked = sorted(routes.ranked())
+    assert [s for _, s in ranked[:8]] == ['a1', 'a2', 'a6', 'b1', 'a3', 'a7', 'b2', 'b6']
+    assert routes.cost('a1') == 1 and routes.cost('a6') == 2 and routes.cost('e10') == 10
+
+
+def test_unknown_slot_has_no_path(routes):
+    assert routes.path('z9') == []
+
+
+def test_layout_without_exit_route_is_rejected():
+    layout = default_layout()
+    layout['rows'][0].pop('tail')
+    layout['rows'][0]['links'] = []
+    with pytest.raises(ValueError, match='without a route'):
+        RouteTable(layout)
+
+
+def test_generated_layout_routes_every_slot():
+    routes = RouteTable(generate_layout(levels=2, rows_per_level=3, slots_per_row=6, entries=2, exits=2))
+    assert len(routes) == 36
+    for slot in routes.slots:
+        path = routes.path(slot, 'Entry2')
+        assert path[0] == 'Entry2' and slot in path and path[-1] in ('Exit1', 'Exit2')
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import number_plate
+
+
+class StillCamera:
+    # The same frame over and over: a car standing at the gate
+    def __init__(self, frames):
+        self.frame = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+        self.left = frames
+
+    def read(self):
+        if not self.left:
+            return False, None
+        self.left -= 1
+        return True, self.frame
+
+
+class FixedPlateDetector:
+    def detect(self, gray):
+        return [(50, 50, 120, 40)]
+
+
+@pytest.fixture
+def readings(monkeypatch):
+    # Replaces OCR with a script of readings; records what was logged
+    script, logged = [], []
+    monkeypatch.setattr(number_plate, 'cached_read_plate', lambda roi: script.pop(0) if script else '')
+    monkeypatch.setattr(number_plate, 'save_plate_data', lambda plate, *args: logged.append(plate))
+    return script, logged
+
+
+def run(frames, mode='gated'):
+    lane = number_plate.LaneState('test')
+    stats = number_plate.run_detection(StillCamera(frames), FixedPlateDetector(), mode, lane,
+                                       headless=True, stop_at_end=True)
+    return stats, lane
+
+
+def test_stationary_car_is_read_until_the_vote_settles(readings):
+    script, logged = readings
+    script += ['HR26DK8387', 'HR26DK8337', 'HR26DK8337', 'HR26DK8337', 'XXXX']
+    stats, lane = run(30)
+    # Three agreeing readings make a majority of five; then frames are skipped
+    assert stats.ocr == 4
+    assert stats.skipped == 30 - 4
+    assert logged == ['HR26DK8387', 'HR26DK8337']
+    assert lane.votes.majority() == 'HR26DK8337'
+
+
+def test_settled_needs_a_majority_of_the_buffer():
+    lane = number_plate.LaneState()
+    for text in ('A1234', 'A1234', 'B1234', 'B1234'):
+        lane.vote(text)
+    assert not lane.settled('A1234')
+    lane.vote('A1234')
+    assert lane.settled('A1234')
@@ -0,0 +1,44 @@
+from collections import Counter, deque
+
+from plate_dedup import PlateDeduper, VoteRing
+
+
+def test_vote_ring_majority_before_wrap():
+    ring = VoteRing(5)
+    assert ring.add('HR26DK8337') == 'HR26DK8337'
+    ring.add('HR26DK8387')
+    assert ring.add('HR26DK8387') == 'HR26DK8387'
+    assert len(ring) == 3
+
+
+def test_vote_ring_tie_after_wrap_goes_to_first_seen_in_window():
+    # 'A' entered the counts first, but that reading has left the window;
+    # of the tied readings 'B' is now the oldest one in the window
+    ring = VoteRing(3)
+    for text in ('A', 'B', 'A'):
+        ring.add(text)
+    assert ring.add('C') == 'B'  # window: B, A, C
+
+
+def test_vote_ring_matches_counter_over_window():
+    readings = ['A', 'B', 'B', 'A', 'C', 'A', 'C', 'C', 'B', 'B', 'A', 'C']
+    ring = VoteRing(4)
+    window = deque(maxlen=4)
+    for text in readings:
+        window.append(text)
+        assert ring.add(text) == Counter(window).most_common(1)[0][0]
+
+
+def test_vote_ring_clear():
+    ring = VoteRing(3)
+    ring.add('A')
+    ring.clear()
+    assert len(ring) == 0
+    assert ring.majority() is None
+
+
+def test_deduper_reentry_window():
+    dedup = PlateDeduper(reentry_seconds=10)
+    dedup.mark('HR26DK8337', now=100.0)
+    assert dedup.seen_recently('HR26DK8337', now=105.0)
+    assert not dedup.seen_recently('HR26DK8337', now=111.0)
@@ -0,0 +1,18 @@
+import pytest
+
+from plate_detector import build_detector, detector_backend
+
+
+@pytest.mark.parametrize('value, backend', [
+    (None, 'cascade'), ('cascade', 'cascade'), ('Cascade', 'cascade'), (' DNN ', 'dnn'),
+])
+def test_detector_backend_is_normalised(value, backend):
+    config = {} if value is None else {'PLATE_DETECTOR': value}
+    assert detector_backend(config) == backend
+
+
+def test_build_detector_uses_normalised_backend():
+    with pytest.raises(ValueError, match='PLATE_DNN_MODEL'):
+        build_detector('upload', config={'PLATE_DETECTOR': 'DNN'})
+    with pytest.raises(ValueError, match='Unknown PLATE_DETECTOR'):
+        build_detector('upload', config={'PLATE_DETECTOR': 'yolo'})
@@ -0,0 +1,67 @@
+import pytest
+
+from allocator import SlotAllocator
+from occupancy_store import OccupancyStore
+from plate_index import PlateIndex, ocr_distance
+
+# app.py's default EXIT_MATCH_MAX_DISTANCE
+EXIT_MATCH_MAX_DISTANCE = 0.5
+
+
+@pytest.mark.parametrize('a, b, edits', [
+    ('HR26DK8337', 'HR26DK8337', 0.0),
+    ('HR26DK8337', 'HR26DK833B', 1.0),   # 7 -> B is an ordinary substitution
+    ('HR26DK8337', 'HR26DK833T', 1.0),
+    ('HR26DK8337', 'HRZ6DK8337', 0.4),   # 2 -> Z is a look-alike
+    ('HR26DK8337', 'HRZGDK8337', 0.8),
+    ('HR26DK8337', 'HR26DK837', 1.0),    # dropped character
+])
+def test_ocr_distance(a, b, edits):
+    assert ocr_distance(a, b) / 10 == edits
+
+
+def test_one_look_alike_is_within_the_default_threshold():
+    index = PlateIndex(['HR26DK8337', 'MH12AB1234'])
+    assert index.best('HR26DK8337', EXIT_MATCH_MAX_DISTANCE) == ('HR26DK8337', 0.0)
+    assert index.best('HR26DK833B', EXIT_MATCH_MAX_DISTANCE) is None
+    assert index.best('MH12A81234', EXIT_MATCH_MAX_DISTANCE) == ('MH12AB1234', 0.4)
+
+
+def test_ordinary_substitution_and_two_look_alikes_are_not():
+    index = PlateIndex(['HR26DK8337'])
+    assert index.best('HR26DK8347', EXIT_MATCH_MAX_DISTANCE) is None
+    assert index.best('HRZGDK8337', EXIT_MATCH_MAX_DISTANCE) is None
+    # ...unless the threshold is raised
+    assert index.best('HRZGDK8337', 1.0) == ('HR26DK8337', 0.8)
+
+
+def test_two_plates_within_the_threshold_are_ambiguous():
+    index = PlateIndex(['MH12AB1234', 'MH12A81234'])
+    # exact match still wins
+    assert index.best('MH12AB1234', EXIT_MATCH_MAX_DISTANCE) == ('MH12AB1234', 0.0)
+    # 0.4 from the first, 0.8 from the second: both within 1.0
+    assert index.best('MH12A8I234', 1.0) is None
+    index = PlateIndex(['HR26DK8337', 'HR26DK8387'])
+    assert index.best('HR26DK83B7', EXIT_MATCH_MAX_DISTANCE) == ('HR26DK8387', 0.4)
+    assert index.best('HR26DK83B7', 1.5) is None
+
+
+def test_removed_plates_are_not_matched():
+    index = PlateIndex(['HR26DK8337'])
+    index.remove('HR26DK8337')
+    assert index.best('HRZ6DK8337', EXIT_MATCH_MAX_DISTANCE) is None
+    index.add('HR26DK8337')
+    assert index.best('HRZ6DK8337', EXIT_MATCH_MAX_DISTANCE) == ('HR26DK8337', 0.4)
+
+
+def test_release_match_frees_the_fuzzy_match(tmp_path):
+    allocator = SlotAllocator(store=OccupancyStore(str(tmp_path / 'occupancy.db')),
+                              slots_file=str(tmp_path / 'slots.txt'))
+    parked = allocator.allocate('HR26DK8337')['slot']
+    allocator.allocate('HR26DK8387')
+
+    assert allocator.release_match('HR26DK8331', EXIT_MATCH_MAX_DISTANCE) is None
+    assert allocator.release_match('HRZ6DK8337') is None  # no fuzzy matching without a distance
+    assert allocator.release_match('HRZ6DK8337', EXIT_MATCH_MAX_DISTANCE) == (parked, 'HR26DK8337', 0.4)
+    assert 'HR26DK8337' not in allocator.store.occupied().values()
+    assert allocator.release_match('hr26dk8387', EXIT_MATCH_MAX_DISTANCE)[1:] == ('HR26DK8387', 0.0)
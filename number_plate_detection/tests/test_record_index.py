@@ -0,0 +1,110 @@
+import glob
+import os
+
+import pytest
+
+from event_log import EventLog
+from record_index import RecordIndex, decode_cursor, encode_cursor
+
+
+def make_log(tmp_path):
+    # Small max_bytes so a handful of rows forces a rotation
+    return EventLog(log_dir=str(tmp_path / 'logs'), flush_ms=0, max_bytes=400)
+
+
+def make_index(tmp_path, log):
+    return RecordIndex(log, legacy_entry=str(tmp_path / 'vehicle_logs.csv'),
+                       legacy_exit=str(tmp_path / 'exit_logs.csv'))
+
+
+def record(log, plates):
+    for plate in plates:
+        log.record('entry', plate, slot='a1', gate='Entry', source='test')
+        assert log.flush(timeout=5)  # one batch per row, so rotation can fall between rows
+
+
+def plates_of(page):
+    return [row['plate'] for row in page]
+
+
+def test_cursor_pages_across_a_rotation(tmp_path):
+    log = make_log(tmp_path)
+    index = make_index(tmp_path, log)
+    first = [f'CAR{i:02d}' for i in range(12)]
+    record(log, first)
+    assert log.rotations >= 1
+
+    page, cursor = index.query(limit=5)
+    assert plates_of(page) == first[::-1][:5]
+    assert cursor is not None
+
+    # More rows, and more rotations, arrive between pages
+    rotations = log.rotations
+    later = [f'NEW{i:02d}' for i in range(12)]
+    record(log, later)
+    assert log.rotations > rotations
+
+    seen = plates_of(page)
+    while cursor:
+        page, cursor = index.query(limit=5, cursor=cursor)
+        seen += plates_of(page)
+    # Every row older than the first page exactly once, none of the new ones
+    assert seen == first[::-1]
+
+    page, _ = index.query(limit=50)
+    assert plates_of(page) == (first + later)[::-1]
+
+
+def test_rows_written_before_rotation_are_read_from_the_old_file(tmp_path):
+    log = make_log(tmp_path)
+    index = make_index(tmp_path, log)
+    record(log, ['FIRST'])
+    assert len(index.query()[0]) == 1  # index now holds logs/events.csv open
+
+    record(log, [f'CAR{i:02d}' for i in range(12)])
+    assert glob.glob(os.path.join(log.archive_dir, '*.csv.gz'))
+    page, cursor = index.query(limit=50)
+    assert sorted(plates_of(page)) == [f'CAR{i:02d}' for i in range(12)] + ['FIRST']
+    assert [(r['time'], r['plate']) for r in page] == sorted(((r['time'], r['plate']) for r in page), reverse=True)
+    assert cursor is None
+    assert len(index) == 13
+
+
+def test_cursor_is_the_last_row_of_the_page(tmp_path):
+    log = make_log(tmp_path)
+    index = make_index(tmp_path, log)
+    record(log, ['A1', 'A2', 'A3'])
+    page, cursor = index.query(limit=2)
+    key = decode_cursor(cursor)
+    assert key[:3] == (page[-1]['time'], 'entry', page[-1]['plate'])
+    assert key[6] == 0
+
+
+def test_cursor_from_one_process_pages_the_same_on_another(tmp_path):
+    # Two workers index the same rows, but one started before the rotations
+    # and read them through its open file while the other read the archives
+    log = make_log(tmp_path)
+    early = make_index(tmp_path, log)
+    record(log, ['CAR00', 'CAR01'])
+    early.query()
+    record(log, [f'CAR{i:02d}' for i in range(2, 14)] + ['CAR03', 'CAR03'])  # repeats in the same second
+    late = make_index(tmp_path, log)
+
+    full, _ = early.query(limit=50)
+    assert full == late.query(limit=50)[0]
+    assert len(full) == 16
+
+    seen, cursor, workers = [], None, [early, late]
+    while True:
+        page, cursor = workers[len(seen) % 2].query(limit=3, cursor=cursor)
+        seen += page
+        if not cursor:
+            break
+    assert seen == full
+
+
+def test_invalid_cursor_is_rejected(tmp_path):
+    index = make_index(tmp_path, make_log(tmp_path))
+    for cursor in ('not a cursor', encode_cursor(['2025-06-16 10:00:00', 3])):
+        with pytest.raises(ValueError):
+            index.query(cursor=cursor)